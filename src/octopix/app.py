@@ -4,19 +4,21 @@
 import sys
 from pathlib import Path
 
-import pandas as pd
-
 from octopix.show.console import Console
 from octopix.show.canvas import CanvasLayout
 from octopix.data.scanner import OFppScanner
+from octopix.data.cache import ReaderCache
+from octopix.data.loader import Loader,LoadRequest,prefetch_keys
+from octopix.data.watcher import PostProcessingWatcher
+from octopix.data.scheduler import UpdateScheduler
+from octopix.data.growth import GrowthTracker
+from octopix.data import diskcache
 from octopix.data.funcs import getAllListItems,getSelectedListItems,are_equal
 from octopix.common.config import supported_post_types,default_field_selection
-from octopix.common.config import OctopixConfigurator
+from octopix.common.config import OctopixConfigurator,cache_dir
 
-from octopost.reader import makeRuntimeSelectableReader
-from octopost.parsing import filter_time_and_columns
 
-from PyQt5.QtCore import pyqtSlot,QTimer,Qt
+from PyQt5.QtCore import pyqtSlot,Qt
 from PyQt5.QtGui import QDoubleValidator,QIcon,QPixmap
 from PyQt5.QtWidgets import QMainWindow,QWidget,QApplication,QCheckBox,QComboBox,\
     QLabel,QLineEdit,QPushButton,QListWidget,QVBoxLayout,QHBoxLayout,QFormLayout,\
@@ -76,7 +78,7 @@ class Octopix(QMainWindow):
     def setPlotStyle(self,style):
         
         self.canvas_layout.mplCanvas.style = style 
-        self.update()
+        self.update(force=True)
     
 
     def __init__(self, show_gui, *args, **kwargs):
@@ -97,6 +99,43 @@ class Octopix(QMainWindow):
         self.show_mean = False
         
         self.OFscanner = OFppScanner(supported_types=supported_post_types, working_dir=self.wDir)
+        # keep the on-disk cache within its budget, before it is used
+        diskcache.prune(int(self.config.getfloat('cache','disk_budget')*1024**2))
+        
+        self.readers = ReaderCache(
+            memory_budget=int(self.config.getfloat('cache','memory_budget')*1024**2),
+            cache_dir=cache_dir(),
+            engines=dict(self.config['parsing']),
+            precisions=dict(self.config['storage'])
+        )
+        
+        # idle files are polled less often
+        self.growth = GrowthTracker(max_interval=self.config.getfloat('autoupdate','max_interval'))
+        
+        self.loader = Loader(self.OFscanner,self.readers,growth=self.growth,parent=self)
+        self.loader.snapshotReady.connect(self.on_snapshot_ready)
+        # the found function objects of the last snapshot, the scanner itself
+        # is only used by the load jobs
+        self.snapshot = None
+        
+        # UI events are debounced and merged with the autoupdate ticks
+        self.scheduler = UpdateScheduler(
+            self.loader,
+            self.loadRequest,
+            debounce=self.config.getfloat('autoupdate','debounce'),
+            cost_factor=self.config.getfloat('autoupdate','cost_factor'),
+            growth=self.growth,
+            # with file system events, polling is only the fallback
+            fallback_interval=self.config.getfloat('watcher','fallback_interval') if self.config.getboolean('watcher','active') else None,
+            parent=self
+        )
+        self.scheduler.intervalChanged.connect(self.on_update_interval_changed)
+        
+        if self.config.getboolean('watcher','active'):
+            self.watcher = PostProcessingWatcher(self)
+            self.watcher.changed.connect(self.on_postprocessing_changed)
+        else:
+            self.watcher = None
         
         self.current_field_selection = {k:[] for k in supported_post_types}
         self.tmin = {k:0.0 for k in supported_post_types}
@@ -249,86 +288,110 @@ class Octopix(QMainWindow):
         if show_gui:
             self.show()
         else:
+            self.scheduler.wait()
             self.canvas_layout.mplCanvas.savePlot()
             sys.exit(0)
         
-        # Timer to trigger the reloading and redrawing by calling te update function.
-        self.timer = QTimer()
-        #self.timer.setInterval(1000)
+        # the autoupdate timer of the scheduler triggers the reloading and redrawing
         self.on_read_autoupdate_interval(autoupdate_interval.text())
-        self.timer.timeout.connect(self.update)
         self.on_auto_update_clicked(auto_update_checkBox.isChecked())
 
 
-    def update(self):
-                
-        self.OFscanner.scan(working_dir=self.wDir)
+    def loadRequest(self):
+        """The current selection, which defines what is loaded."""
         
-        currentFoundItems = self.OFscanner.post_types
+        try:
+            data_name = self.filelist.currentItem().text()
+        except:
+            data_name = None
+        
+        return LoadRequest(
+            case_dir=Path(self.wDir),
+            data_type=self.data_type,
+            data_name=data_name,
+            data_subset=tuple(self.data_subset),
+            # what on_snapshot_ready selects for a new file
+            default_subset=tuple(
+                self.current_field_selection.get(self.data_type) 
+                or default_field_selection.get(self.data_type,[])
+            ),
+            tmin=self.tmin.get(self.data_type),
+            tmax=self.tmax.get(self.data_type),
+            show_all=self.show_all,
+            show_mean=self.show_mean,
+        )
+
+
+    def update(self,force=False):
+        """Scanning and loading is done in the background, the result
+        is shown by on_snapshot_ready. Without force, nothing is redrawn
+        if neither the selection nor the data files have changed.
+        """
+        self.scheduler.request(force=force)
 
-        currentLoadedItems = [self.datatype_comboBox.itemText(i) for i in range(self.datatype_comboBox.count())]
+
+    def schedule_update(self):
+        """Update after a change of the selection, once the UI is quiet."""
+        self.scheduler.schedule()
+
+
+    def on_snapshot_ready(self,snapshot):
         
-        if not are_equal(currentFoundItems,currentLoadedItems):
-            self.canvas_layout.mplCanvas.clear()
-            self.datatype_comboBox.clear()
-            self.datatype_comboBox.addItems(self.OFscanner.post_types)
+        # the found data types are shown, even if the loading failed
+        if snapshot.post_types is not None:
+            
+            self.snapshot = snapshot
+            
+            currentFoundItems = snapshot.post_types
+    
+            currentLoadedItems = [self.datatype_comboBox.itemText(i) for i in range(self.datatype_comboBox.count())]
+            
+            if not are_equal(currentFoundItems,currentLoadedItems):
+                self.canvas_layout.mplCanvas.clear()
+                self.datatype_comboBox.clear()
+                self.datatype_comboBox.addItems(snapshot.post_types)
+        
+        if snapshot.error is not None:
+            self.console.sendToOutput('Loading failed: {0:}'.format(snapshot.error))
+            return
         
-        if len(self.OFscanner.post_types) == 0:
+        # the selection has changed meanwhile, the new request is on its way.
+        # The UI itself is compared, since its changes are only requested 
+        # after the debounce interval.
+        if snapshot.request != self.loadRequest():
+            return
+        
+        if self.watcher is not None:
+            self.watcher.watch(snapshot.request.case_dir,snapshot.ppObjects,snapshot.files)
+        
+        if len(snapshot.post_types) == 0:
             self.filelist.clear()
+        elif snapshot.request.data_type not in snapshot.post_types:
+            # scan only, the data type is selected by the combobox
+            pass
         else:
-        
-            try:
-                data_name = self.filelist.currentItem().text()
-            except:
-                data_name = None
-    
-            # load the data and provide the dataframe to canvas 
-            # data_type defines the reader
-            reader = makeRuntimeSelectableReader(reader_name=self.data_type, base_dir=data_name, case_dir=self.wDir)
-            fields = reader.fields()
             
-            if self.OFscanner.ppObjects:
-                df = filter_time_and_columns(
-                    df=reader.data,
-                    time_start=self.tmin[self.data_type],
-                    time_end=self.tmax[self.data_type],
-                    data_subset=self.data_subset
-                    )
-                if self.show_all and (self.tmin[self.data_type] is not None or self.tmax[self.data_type] is not None):
-                    df_full = filter_time_and_columns(
-                        df=reader.data,
-                        time_start=None,
-                        time_end=None,
-                        data_subset=self.data_subset
-                    )
-                else:
-                    df_full = None
-                if self.show_mean and not df.empty:
-                    mean_values = df.mean()
-                else:
-                    mean_values = None
-            else:
-                df = pd.DataFrame()
-                df_full = None
-                mean_values = None
+            request = snapshot.request
+            fields = snapshot.fields
     
             self.canvas_layout.mplCanvas.update_plot(
-                df,
-                self.data_type,
-                data_name,
-                full_data=df_full,
-                mean_values=mean_values,
+                snapshot.data,
+                request.data_type,
+                request.data_name,
+                full_data=snapshot.full_data,
+                mean_values=snapshot.mean_values,
             )
             
             # if data type has changed, we need to update the list of fields
             if not are_equal(getAllListItems(self.fieldlist), fields):
     
                 # either apply the previous selection or the default if prev is empty
-                if self.current_field_selection[self.data_type]:
-                    fields_to_select = self.current_field_selection[self.data_type]
+                if self.current_field_selection[request.data_type]:
+                    fields_to_select = self.current_field_selection[request.data_type]
                 else:
-                    fields_to_select = default_field_selection.get(self.data_type,fields)
-                    
+                    fields_to_select = default_field_selection.get(request.data_type,fields)
+                
+                self.fieldlist.blockSignals(True)
                 self.fieldlist.clear() 
                 self.fieldlist.addItems(fields)
                     
@@ -336,11 +399,48 @@ class Octopix(QMainWindow):
                     list_item = self.fieldlist.item(i) 
                     if list_item.text() in fields_to_select:
                         list_item.setSelected(True)
+                self.fieldlist.blockSignals(False)
+                
+                self.on_fieldlist_selection_changed()
             
-            self.data_subset = getSelectedListItems(self.fieldlist)
+            self.console.update(snapshot.data,stats=snapshot.stats)
             
-            self.console.update(df)
+            # the other function objects are loaded meanwhile, so they are 
+            # shown right away when selected
+            if self.config.getboolean('prefetch','active'):
+                budget = min(
+                    self.config.getfloat('prefetch','memory_budget'),
+                    self.config.getfloat('cache','memory_budget')
+                )
+                self.loader.prefetch(prefetch_keys(request.case_dir,snapshot.ppObjects),int(budget*1024**2))
+        
+
+    def on_postprocessing_changed(self,name):
+        """File system event in postProcessing/<name>"""
+        
+        if not self.scheduler.active():
+            return
+        
+        if name:
+            self.OFscanner.invalidate(name)
+        self.scheduler.tick(rescan=False)
+
+
+    def on_update_interval_changed(self,interval):
+        """Show the refresh rate of the autoupdate, as measured, and the
+        shortest interval allowed by the cost of the updates.
+        """
+        
+        if not self.scheduler.active():
+            self.statusBar().clearMessage()
+            return
+        
+        rate = self.scheduler.rate()
         
+        self.statusBar().showMessage('Autoupdate {0:}, at most every {1:.3g} s, last update took {2:.3g} s'.format(
+            'at {0:.3g} Hz'.format(rate) if rate is not None else 'on',
+            interval,self.scheduler.last_cost))
+
 
     def on_clicked_openPP(self):
         
@@ -363,10 +463,12 @@ class Octopix(QMainWindow):
         """
         if state == Qt.Checked or state:
             self.console.sendToOutput('Autoupdate on')
-            self.timer.start()
+            self.scheduler.start()
+            self.on_update_interval_changed(self.scheduler.effective_interval())
         elif state == Qt.Unchecked or not state:
             self.console.sendToOutput('Autoupdate off')
-            self.timer.stop()
+            self.scheduler.stop()
+            self.on_update_interval_changed(self.scheduler.effective_interval())
         else:
             raise TypeError
 
@@ -377,7 +479,7 @@ class Octopix(QMainWindow):
             self.show_all = False
         else:
             raise TypeError
-        self.update()
+        self.schedule_update()
 
     def on_show_mean_clicked(self, state):
         if state == Qt.Checked or state:
@@ -386,7 +488,7 @@ class Octopix(QMainWindow):
             self.show_mean = False
         else:
             raise TypeError
-        self.update()
+        self.schedule_update()
     
 
     @pyqtSlot()
@@ -394,7 +496,7 @@ class Octopix(QMainWindow):
         """Reload data push button
         """
         self.console.sendToOutput('Reloading data')
-        self.update()
+        self.update(force=True)
 
     def on_read_eval_start_time(self,text):
         try:
@@ -402,7 +504,7 @@ class Octopix(QMainWindow):
         except:
             self.console.sendToOutput('ups')
         
-        self.update()
+        self.schedule_update()
 
     def on_read_eval_end_time(self,text):
         if text == "":
@@ -414,21 +516,26 @@ class Octopix(QMainWindow):
                 self.console.sendToOutput('ups')
                 return
         
-        self.update()
+        self.schedule_update()
     
     def on_read_autoupdate_interval(self,text):
+        """The shortest interval between two automatic updates."""
         try:
-            self.timer.setInterval(int(float(text)*1000))
+            self.scheduler.set_interval(float(text))
         except:
             self.console.sendToOutput('ups')        
     
     def on_datatype_selection_changed(self,i):
         
         try:
-            self.data_type = self.OFscanner.post_types[i]
+            # -1 for the cleared combobox
+            if self.snapshot is None or i < 0:
+                raise IndexError
+            
+            self.data_type = self.snapshot.post_types[i]
            
             self.filelist.clear()
-            self.filelist.addItems(self.OFscanner.ppObjects[self.data_type])
+            self.filelist.addItems(self.snapshot.ppObjects[self.data_type])
             self.filelist.setCurrentRow(0)
             
             self.tmin_textfield.setText("{:g}".format(self.tmin[self.data_type]))
@@ -437,7 +544,7 @@ class Octopix(QMainWindow):
             else:
                 self.tmax_textfield.setText("{:g}".format(self.tmax[self.data_type]))
                    
-            self.update()
+            self.schedule_update()
             
         except IndexError:
             self.canvas_layout.mplCanvas.clear()
@@ -447,12 +554,26 @@ class Octopix(QMainWindow):
         
         self.data_subset = getSelectedListItems(self.fieldlist)
         self.current_field_selection[self.data_type] = getSelectedListItems(self.fieldlist)
-        self.update()
+        self.schedule_update()
+
+
+    def closeEvent(self,event):
+        """No updates are started anymore and the running load and prefetch
+        jobs are cancelled. The window closes, once they have stopped.
+        """
+        self.scheduler.cancel()
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.loader.shutdown()
         
+        event.accept()
         
 
 def run():
     
+    if sys.argv[1:2] == ['cache']:
+        sys.exit(diskcache.main(sys.argv[2:]))
+    
     app = QApplication(sys.argv)
     octopix = Octopix(show_gui=True)
     app.exec_()
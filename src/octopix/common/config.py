@@ -10,6 +10,9 @@ import os
 
 supported_post_types = ['residuals','forces','rigidBodyState','time','fieldMinMax','actuatorDisk','sectionalForces']
 
+# the data types, which are usually looked at first, are prefetched first
+prefetch_order = ['residuals','forces','time']
+
 default_field_selection = {'forces':['fx'],'rigidBodyState':['z','pitch'],'time':['cpu/step','clock/step'],'actuatorDisk':['thrust'],'sectionalForces':['S0 Total Force x']}
 
 rgb_colors = {}
@@ -31,11 +34,62 @@ cfg_data = {
     'autoupdate':
     {
             'interval': 1.0,
-            'active_on_start': True
+            'active_on_start': True,
+            # delay in seconds, by which updates due to UI events (typing a
+            # time, selecting fields) are deferred until the UI is quiet
+            'debounce': 0.15,
+            # the time between the updates is at least cost_factor times
+            # the time the last update took, i.e. the interval grows for
+            # large files
+            'cost_factor': 2.0,
+            # the interval doubles while the displayed files do not grow,
+            # up to max_interval seconds, e.g. for finished runs
+            'max_interval': 60.0
+    },
+    'cache':
+    {
+        # memory budget for the loaded data in MB
+        'memory_budget': 1024,
+        # size budget for the parsed data kept on disk in MB, the least
+        # recently used data is removed on start
+        'disk_budget': 2048
+    },
+    'parsing':
+    {
+        # engine for parsing the .dat files: pandas, numpy, pyarrow (if
+        # installed) or auto for the fastest one. It can be set per data
+        # type as well, e.g. forces = numpy
+        'engine': 'auto'
+    },
+    'storage':
+    {
+        # precision of the values kept in memory and on disk: float64 or
+        # float32 for half the memory, the time is always float64. It can
+        # be set per data type as well, e.g. forces = float32
+        'precision': 'float64'
+    },
+    'prefetch':
+    {
+        # load the other function objects in the background, while the
+        # loaded data is below memory_budget MB (and the one of the cache)
+        'active': True,
+        'memory_budget': 512
+    },
+    'watcher':
+    {
+        # update on file system events, with polling every
+        # fallback_interval seconds for file systems without events
+        'active': True,
+        'fallback_interval': 10.0
     }
     
 }
 
+def cache_dir():
+    """Directory for cached data, i.e. the parsed data and the line indices of the .dat files."""
+    base = os.environ.get('XDG_CACHE_HOME') or Path(Path.home() / ".cache")
+    return Path(Path(base) / "octopix")
+
 def getBool(s):
     val = str(s).strip().lower()
     if val in ("y", "yes", "t", "true", "on", "1"):
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""In-memory cache of the data readers"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from octopix.data.reader import TailReader
+
+
+def reader_nbytes(reader):
+    """Memory used by the data of a reader in bytes."""
+    return reader.nbytes()
+
+
+class ReaderCache(object):
+    """Keeps the readers (and with them the loaded data) keyed by
+    (case_dir, data_type, data_name), the least recently used first.
+
+    If the data of all readers exceeds the memory budget, the least
+    recently used readers are dropped. The most recently used reader is
+    always kept, regardless of its size. Thread safe, the readers themselves
+    are guarded by their lock.
+
+    Parameter
+    ---------
+
+    memory_budget : int
+        memory budget in bytes, None for no limit
+    cache_dir : Path-like
+        directory for the on-disk cache of the readers, None for no on-disk cache
+    engines : dict
+        the parse engine by data type, the one for other data types with the
+        key 'engine'. 'auto' (the default) picks the fastest engine. The keys
+        are case insensitive, as the options of the config.
+    precisions : dict
+        the precision of the values by data type, 'float32' or 'float64',
+        the one for other data types with the key 'precision'. The keys are
+        case insensitive as well.
+    """
+
+    def __init__(self,memory_budget=None,cache_dir=None,engines=None,precisions=None):
+
+        self.memory_budget = memory_budget
+        self.cache_dir = cache_dir
+        self.engines = {k.lower():v for k,v in (engines or {}).items()}
+        self.precisions = {k.lower():v for k,v in (precisions or {}).items()}
+        self.readers = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __contains__(self,key):
+        with self._lock:
+            return key in self.readers
+
+    def __len__(self):
+        with self._lock:
+            return len(self.readers)
+
+    def get(self,case_dir,data_type,data_name,prefetch=False):
+        """Return the cached reader or create a new one. The reader is
+        marked as most recently used, or, if it is prefetched, a new one as
+        least recently used.
+        """
+        key = (Path(case_dir),data_type,data_name)
+
+        with self._lock:
+            if key in self.readers:
+                if not prefetch:
+                    self.readers.move_to_end(key)
+            else:
+                engine = self.engines.get(data_type.lower(),self.engines.get('engine'))
+                precision = self.precisions.get(data_type.lower(),self.precisions.get('precision'))
+                self.readers[key] = TailReader(data_type,data_name,case_dir,cache_dir=self.cache_dir,engine=engine,precision=precision)
+                if prefetch:
+                    self.readers.move_to_end(key,last=False)
+
+            return self.readers[key]
+
+    def nbytes(self):
+        with self._lock:
+            return sum(reader_nbytes(reader) for reader in self.readers.values())
+
+    def trim(self):
+        """Drop least recently used readers until the memory budget is met.
+
+        Returns
+        -------
+
+        list of the dropped keys
+        """
+        dropped = []
+
+        if self.memory_budget is None:
+            return dropped
+
+        with self._lock:
+            total = self.nbytes()
+
+            while total > self.memory_budget and len(self.readers) > 1:
+                key,reader = self.readers.popitem(last=False)
+                total -= reader_nbytes(reader)
+                dropped.append(key)
+
+        return dropped
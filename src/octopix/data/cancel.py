@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Cancellation of loads, which were superseded by a newer request"""
+
+import threading
+
+
+class LoadCancelled(Exception):
+    """Raised within a load, which was cancelled."""
+    pass
+
+
+class CancelToken(object):
+    """Shared by a load job and the Loader, which cancels it, once the user
+    selected something else. The load checks it between the parsed chunks
+    and raises LoadCancelled. Thread safe.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raise LoadCancelled, if the load was cancelled."""
+        if self._event.is_set():
+            raise LoadCancelled()
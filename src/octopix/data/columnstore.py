@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Append-only columnar storage of the time series of a reader"""
+
+import numpy as np
+import pandas as pd
+
+
+class ColumnStore(object):
+    """The times and the values of a series in preallocated numpy arrays, the
+    values column by column (Fortran order). The capacity is doubled when
+    full, hence appending costs time proportional to the appended rows only.
+
+    The frames returned by frame() are views on the arrays. Rows, which have
+    been handed out once, are never modified: appending writes behind them
+    and anything else makes new arrays. Arrays which are not writable (e.g.
+    memory mapped) are used as they are, until the first append.
+
+    The times are always float64, the values are float64 or, to halve the
+    memory of long series, float32.
+
+    Parameters
+    ----------
+
+    time : ndarray
+        the times
+    values : ndarray
+        the values, one column per field
+    columns : list
+        the field names
+    index_name : str
+        name of the time index
+    """
+
+    min_capacity = 1024
+    dtypes = {'float32': np.dtype(np.float32), 'float64': np.dtype(np.float64)}
+
+    def __init__(self,time,values,columns,index_name=None):
+
+        self.columns = list(columns)
+        self.index_name = index_name
+
+        self._time = time
+        self._values = values
+        self._n = len(time)
+
+    @classmethod
+    def value_dtype(cls,precision):
+        """The dtype of the values for the precision 'float32' or 'float64',
+        float64 for anything else.
+        """
+        return cls.dtypes.get(str(precision).strip().lower(),cls.dtypes['float64'])
+
+    @classmethod
+    def from_frame(cls,df,dtype=np.float64):
+        """Wrap the data of a frame, without a copy if it has the dtype already.
+        Raises ValueError or TypeError for non-numeric data.
+        """
+        time = df.index.to_numpy(dtype=np.float64)
+        values = df.to_numpy(dtype=dtype)
+
+        return cls(time,values,df.columns,df.index.name)
+
+    def __len__(self):
+        return self._n
+
+    def capacity(self):
+        return len(self._time)
+
+    @property
+    def dtype(self):
+        """The dtype of the values."""
+        return self._values.dtype
+
+    def nbytes(self):
+        """Allocated memory in bytes."""
+        return self._time.nbytes + self._values.nbytes
+
+    def time(self):
+        return self._time[:self._n]
+
+    def values(self):
+        return self._values[:self._n]
+
+    def frame(self):
+        """Return the data as DataFrame, which shares the memory of the store."""
+        return pd.DataFrame(
+            self.values(),
+            index=pd.Index(self.time(),name=self.index_name,copy=False),
+            columns=self.columns,
+            copy=False,
+        )
+
+    def _grow(self,n_min):
+
+        capacity = max(self.min_capacity,2*self.capacity(),n_min)
+
+        time = np.empty(capacity,dtype=self._time.dtype)
+        values = np.empty((capacity,len(self.columns)),dtype=self._values.dtype,order='F')
+        time[:self._n] = self.time()
+        values[:self._n] = self.values()
+
+        self._time,self._values = time,values
+
+    def append(self,time,values):
+        """Append rows, the values in the order of the columns. They are cast
+        to the dtype of the store.
+        """
+
+        k = len(time)
+        if k == 0:
+            return
+
+        if self._n + k > self.capacity() or not (self._time.flags.writeable and self._values.flags.writeable):
+            self._grow(self._n + k)
+
+        self._time[self._n:self._n + k] = time
+        self._values[self._n:self._n + k] = values
+        self._n += k
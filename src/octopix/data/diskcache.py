@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""On-disk cache of the parsed data of the function objects.
+
+The data of a reader is stored as .npy files, the times and the values
+column by column, plus a meta.json with the state of the .dat files and
+the offset in the newest file up to which the data was parsed. The arrays
+are memory mapped when reopened, only the lines appended since have to be
+parsed.
+
+The cache directory is kept below a size budget by removing the least
+recently used entries, see prune(). Reading an entry updates its mtime,
+which serves as time of the last access. Run as script, or with
+"octopix cache", the cache is managed from the command line.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from octopix.common.config import OctopixConfigurator,cache_dir
+
+
+def entry_dir(data_dir,key):
+    """Directory of the cache entry of the reader with the given key."""
+    name = hashlib.sha1(repr(tuple(str(k) for k in key)).encode()).hexdigest()
+    return Path(data_dir,name)
+
+
+def write_data(path,data,files,offset,fields,dtype=np.float64):
+    """Store the data of a reader.
+
+    Parameters
+    ----------
+
+    path : Path-like
+        the directory of the cache entry
+    data : DataFrame
+        the data indexed by time
+    files : list of FileState
+        the state of the .dat files the data was read from
+    offset : int
+        the offset of the first byte in the newest file, which is not
+        contained in data
+    fields : list
+        the field names of the reader
+    dtype : dtype
+        the dtype of the stored values, the times are stored as float64
+
+    Returns
+    -------
+
+    bool : if the data was stored, the cache is optional and errors are ignored
+    """
+    path = Path(path)
+
+    meta = {
+        'files': [[str(f.path),f.ino,f.size,f.mtime_ns] for f in files],
+        'offset': offset,
+        'rows': len(data),
+        'columns': [str(c) for c in data.columns],
+        'index_name': data.index.name,
+        'fields': [str(f) for f in fields],
+    }
+
+    try:
+        os.makedirs(path,exist_ok=True)
+
+        # the entry is invalid until the new meta data is written
+        if Path(path,'meta.json').exists():
+            os.remove(Path(path,'meta.json'))
+
+        arrays = {
+            'time': data.index.to_numpy(dtype=np.float64),
+            'values': np.asfortranarray(data.to_numpy(dtype=dtype)),
+        }
+        for name,arr in arrays.items():
+            with open(Path(path,name + '.tmp'),'wb') as f:
+                np.save(f,arr)
+            os.replace(Path(path,name + '.tmp'),Path(path,name + '.npy'))
+
+        with open(Path(path,'meta.tmp'),'w') as f:
+            json.dump(meta,f)
+        os.replace(Path(path,'meta.tmp'),Path(path,'meta.json'))
+
+    except OSError:
+        return False
+
+    return True
+
+
+def read_data(path):
+    """Open a cache entry, the values are memory mapped (read only).
+
+    Returns
+    -------
+
+    (DataFrame, dict) : the data and the meta data, None if there is no
+    valid entry
+    """
+    path = Path(path)
+
+    try:
+        with open(Path(path,'meta.json')) as f:
+            meta = json.load(f)
+        times = np.load(Path(path,'time.npy'),mmap_mode='r')
+        values = np.load(Path(path,'values.npy'),mmap_mode='r')
+    except (OSError,ValueError):
+        return None
+
+    touch(Path(path,'meta.json'))
+
+    rows = meta.get('rows')
+    if times.shape != (rows,) or values.shape != (rows,len(meta['columns'])):
+        return None
+
+    data = pd.DataFrame(
+        values,
+        index=pd.Index(times,name=meta['index_name']),
+        columns=meta['columns'],
+        copy=False,
+    )
+
+    return data,meta
+
+
+def touch(path):
+    """Mark a cache file as used now."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+CacheEntry = namedtuple('CacheEntry',['path','nbytes','last_access'])
+CacheEntry.__doc__ = """A stored data directory, line index or the header cache, last_access is a timestamp"""
+
+
+def cache_entries(path=None):
+    """Return the entries of the cache directory, least recently used first."""
+
+    path = Path(path if path is not None else cache_dir())
+    entries = []
+
+    try:
+        with os.scandir(Path(path,'data')) as it:
+            dirs = [e.path for e in it if e.is_dir()]
+    except (FileNotFoundError,NotADirectoryError):
+        dirs = []
+
+    for d in dirs:
+        try:
+            with os.scandir(d) as it:
+                stats = [e.stat() for e in it if e.is_file()]
+        except FileNotFoundError:
+            continue
+        entries.append(CacheEntry(
+            Path(d),
+            sum(st.st_size for st in stats),
+            max([st.st_mtime for st in stats],default=0.0),
+        ))
+
+    # the line indices and the header cache
+    for d in (Path(path,'index'),path):
+        try:
+            with os.scandir(d) as it:
+                for e in it:
+                    if e.is_file():
+                        st = e.stat()
+                        entries.append(CacheEntry(Path(e.path),st.st_size,st.st_mtime))
+        except (FileNotFoundError,NotADirectoryError):
+            pass
+
+    return sorted(entries,key=lambda entry: entry.last_access)
+
+
+def remove_entry(entry):
+
+    try:
+        if entry.path.is_dir():
+            shutil.rmtree(entry.path)
+        else:
+            os.remove(entry.path)
+    except FileNotFoundError:
+        pass
+
+
+def prune(budget,path=None):
+    """Remove the least recently used entries until the cache is within budget.
+    Data, which is memory mapped by a running octopix, stays valid until it is
+    closed.
+
+    Parameters
+    ----------
+
+    budget : int
+        size budget of the cache in bytes
+    path : Path-like
+        the cache directory, by default the one of the user
+
+    Returns
+    -------
+
+    list of the removed CacheEntry
+    """
+    entries = cache_entries(path)
+    total = sum(entry.nbytes for entry in entries)
+
+    removed = []
+    for entry in entries:
+        if total <= budget:
+            break
+        remove_entry(entry)
+        total -= entry.nbytes
+        removed.append(entry)
+
+    return removed
+
+
+def clear(path=None):
+    """Remove all entries of the cache.
+
+    Returns
+    -------
+
+    list of the removed CacheEntry
+    """
+    entries = cache_entries(path)
+    for entry in entries:
+        remove_entry(entry)
+
+    return entries
+
+
+def _mb(nbytes):
+    return "{0:.1f} MB".format(nbytes/1024**2)
+
+
+def main(argv=None):
+    """The "octopix cache" command."""
+
+    config = OctopixConfigurator()
+    budget = config.getfloat('cache','disk_budget')
+
+    parser = argparse.ArgumentParser(
+        prog='octopix cache',
+        description='Manage the cache of parsed function object data in {0:}'.format(cache_dir()),
+    )
+    sub = parser.add_subparsers(dest='command',required=True)
+    sub.add_parser('stats',help='show the size of the cache')
+    prune_parser = sub.add_parser('prune',help='remove the least recently used entries exceeding the budget')
+    prune_parser.add_argument('--budget',type=float,default=budget,help='budget in MB, default: {0:g}'.format(budget))
+    sub.add_parser('clear',help='remove all entries')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'stats':
+        entries = cache_entries()
+        data = [e for e in entries if e.path.parent.name == 'data']
+        print('location:     {0:}'.format(cache_dir()))
+        print('data entries: {0:} ({1:})'.format(len(data),_mb(sum(e.nbytes for e in data))))
+        print('indices:      {0:} ({1:})'.format(len(entries) - len(data),_mb(sum(e.nbytes for e in entries if e not in data))))
+        print('total:        {0:} of {1:} budget'.format(_mb(sum(e.nbytes for e in entries)),_mb(budget*1024**2)))
+        if entries:
+            print('last access:  {0:} (oldest), {1:} (newest)'.format(
+                time.strftime('%Y-%m-%d %H:%M',time.localtime(entries[0].last_access)),
+                time.strftime('%Y-%m-%d %H:%M',time.localtime(entries[-1].last_access)),
+            ))
+    elif args.command == 'prune':
+        removed = prune(int(args.budget*1024**2))
+        print('removed {0:} entries ({1:})'.format(len(removed),_mb(sum(e.nbytes for e in removed))))
+    elif args.command == 'clear':
+        removed = clear()
+        print('removed {0:} entries ({1:})'.format(len(removed),_mb(sum(e.nbytes for e in removed))))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Growth of the data files, which sets the cadence of the autoupdate"""
+
+import time
+import threading
+from collections import namedtuple
+
+
+FileGrowth = namedtuple('FileGrowth',['ino','size','since','level','growing'])
+FileGrowth.__doc__ = """Size of a data file when last seen, the time it last changed or backed off, its back-off level and if it grew at the last observation"""
+
+
+class GrowthTracker(object):
+    """Tracks the growth of the displayed data files, to poll files of idle or
+    finished runs less often than those of running ones.
+
+    Each file has a back-off level, its update interval is interval*2**level,
+    at most max_interval. The level is raised, whenever the file did not grow
+    for its current interval (exponential back-off). It is lowered by one,
+    when the file grew, and reset to 0, when the file grew at consecutive
+    observations, i.e. it grows at least as fast as it is polled. The
+    interval of the displayed data is the one of its fastest file.
+
+    The observations are made by the load jobs, the interval is queried by
+    the UpdateScheduler. Thread safe.
+
+    Parameter
+    ---------
+
+    max_interval : float
+        longest update interval in seconds
+    """
+
+    # the timers may fire a bit early
+    slack = 0.9
+
+    def __init__(self,max_interval=60.0):
+
+        self.max_interval = max_interval
+        self.interval = 1.0
+
+        self._files = {}
+        self._current = ()
+        self._lock = threading.Lock()
+
+    def _interval(self,level):
+        return max(self.interval,min(self.max_interval,self.interval*2**level))
+
+    def observe(self,states,now=None):
+        """Record the state of the displayed files.
+
+        Parameters
+        ----------
+
+        states : list of FileState
+            the files of the displayed data, None if unknown
+        now : float
+            time of the observation, time.monotonic() by default
+        """
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            self._current = tuple(s.path for s in states or ())
+
+            for s in states or ():
+                f = self._files.get(s.path)
+                if f is None:
+                    f = FileGrowth(s.ino,s.size,now,0,False)
+                elif (s.ino,s.size) != (f.ino,f.size):
+                    level = 0 if f.growing else max(0,f.level - 1)
+                    f = FileGrowth(s.ino,s.size,now,level,True)
+                elif now - f.since >= self.slack*self._interval(f.level) and self._interval(f.level) < self.max_interval:
+                    # idle for the current interval, back off
+                    f = FileGrowth(f.ino,f.size,now,f.level + 1,False)
+                else:
+                    f = f._replace(growing=False)
+                self._files[s.path] = f
+
+    def delay(self):
+        """The update interval of the displayed data in seconds."""
+
+        with self._lock:
+            levels = [self._files[p].level for p in self._current if p in self._files]
+
+        if not levels:
+            return self.interval
+
+        return self._interval(min(levels))
+
+    def level(self,path):
+        """The back-off level of a file, None if it was not observed."""
+
+        with self._lock:
+            f = self._files.get(path)
+
+        return None if f is None else f.level
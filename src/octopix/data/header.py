@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Field names of the .dat files from their comment header.
+
+The field names are defined by the octopost reader. After a full load, they
+are kept together with the column names of the header and the format of the
+data lines, so that any other file of the same kind (e.g. all forces files,
+whatever their centre of rotation) gets its field names by reading a few 
+hundred bytes.
+"""
+
+import os
+import re
+import json
+import threading
+from pathlib import Path
+
+
+_number = re.compile(rb'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|[-+]?(?:nan|inf)',re.IGNORECASE)
+
+
+def column_names(header):
+    """The names in the last comment line of the header, which are the 
+    column names.
+    """
+    for line in reversed(header.splitlines()):
+        names = line.strip().lstrip(b'#').split()
+        if names:
+            return names
+    return []
+
+
+def line_format(line):
+    """The format of a data line: the numbers replaced by 0, the whitespace
+    collapsed and dropped next to the brackets.
+    """
+    line = b' '.join(_number.sub(b'0',line).split())
+    return re.sub(rb' ?([()]) ?',rb'\1',line)
+
+
+def read_header(path,chunk_size=1024):
+    """Return the comment lines at the top of a .dat file and its first data
+    line, b'' if there is no complete one yet.
+    """
+
+    with open(path,'rb') as f:
+        buf = b''
+        while True:
+            chunk = f.read(chunk_size)
+            buf += chunk
+            # the header ends with the first complete line, which is no comment
+            begin = 0
+            end = buf.find(b'\n') + 1
+            while end > 0:
+                line = buf[begin:end]
+                if line.strip() and not line.lstrip().startswith(b'#'):
+                    return buf[:begin],line
+                begin,end = end,buf.find(b'\n',end) + 1
+            if not chunk:
+                return buf[:begin],b''
+            chunk_size *= 2
+
+
+class HeaderCache(object):
+    """The column names, time index name and field names, keyed by data type,
+    the column names in the header and the format of the data lines. The keys
+    are cached by file identity, i.e. path and inode. Thread safe.
+
+    Parameter
+    ---------
+
+    path : Path-like
+        json file to keep the names between sessions, None to keep them in
+        memory only
+    """
+
+    def __init__(self,path=None):
+
+        self.path = path
+        self._names = {}
+        self._headers = {}
+        self._lock = threading.Lock()
+
+        if path is not None:
+            try:
+                with open(path) as f:
+                    self._names = json.load(f)
+            except (OSError,ValueError):
+                pass
+
+    def header(self,path):
+        """The column names and the data line format of a file, read only 
+        once per file, unless it has no data line yet.
+        """
+        key = (str(path),os.stat(path).st_ino)
+
+        with self._lock:
+            header = self._headers.get(key)
+
+        if header is None:
+            lines,line = read_header(path)
+            header = b' '.join(column_names(lines)) + b'\n' + line_format(line)
+            if line:
+                with self._lock:
+                    self._headers[key] = header
+
+        return header
+
+    def _key(self,data_type,path):
+        return data_type + '\n' + self.header(path).decode('latin-1')
+
+    def get(self,data_type,path):
+        """Return the names for the file as dict with the keys 'columns',
+        'index_name' and 'fields', None if its header is unknown.
+        """
+        try:
+            key = self._key(data_type,path)
+        except OSError:
+            return None
+
+        with self._lock:
+            return self._names.get(key)
+
+    def put(self,data_type,path,names):
+        """Keep the names of the file, as found by a full load."""
+
+        try:
+            key = self._key(data_type,path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._names.get(key) == names:
+                return
+            self._names[key] = names
+            data = dict(self._names)
+
+        self._save(data)
+
+    def _save(self,data):
+
+        if self.path is None:
+            return
+
+        tmp = Path(self.path).with_suffix('.tmp')
+        try:
+            os.makedirs(Path(self.path).parent,exist_ok=True)
+            with open(tmp,'w') as f:
+                json.dump(data,f)
+            os.replace(tmp,self.path)
+        except OSError:
+            pass
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def header_cache(cache_dir=None):
+    """The header cache of the cache directory, shared by all readers."""
+
+    path = Path(cache_dir,'headers.json') if cache_dir is not None else None
+
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = HeaderCache(path)
+        return _caches[path]
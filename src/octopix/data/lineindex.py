@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Sparse index of the lines of a .dat file for random access by time.
+
+Every stride-th line, the time and the byte offset of the line are kept.
+The index is stored as sidecar file in the cache directory, it is built once
+and extended with the lines appended to the file.
+"""
+
+import os
+import json
+import bisect
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+from octopix.data.parsing import complete_lines,read_bytes,line_time
+from octopix.data.diskcache import touch
+
+
+def index_path(index_dir,path):
+    """Path of the sidecar file for the data file path."""
+    name = hashlib.sha1(str(Path(path).absolute()).encode()).hexdigest()
+    return Path(index_dir,name + '.json')
+
+
+class LineIndex(object):
+    """Time to byte offset index of one .dat file.
+
+    Parameter
+    ---------
+
+    path : Path-like
+        the .dat file
+    index_dir : Path-like
+        directory of the sidecar files, None for an index kept in memory only
+    """
+
+    # a time and offset is kept for every stride-th line
+    stride = 1000
+
+    # size of the chunks read when the index is built
+    chunk_size = 16*1024*1024
+
+    def __init__(self,path,index_dir=None):
+
+        self.path = Path(path)
+        self.index_dir = index_dir
+
+        # information of the reader, e.g. the column names, to parse the
+        # file without a full load
+        self.header = {}
+
+        self._reset()
+        self._read()
+
+    def _reset(self,ino=None):
+
+        self.ino = ino
+        self.times = []
+        self.offsets = []
+        # number of lines and bytes indexed, time of the last data line
+        self.lines = 0
+        self.end = 0
+        self.last_time = None
+        self._dirty = True
+
+    def _read(self):
+
+        if self.index_dir is None:
+            return
+
+        try:
+            with open(index_path(self.index_dir,self.path)) as f:
+                d = json.load(f)
+        except (OSError,ValueError):
+            return
+
+        touch(index_path(self.index_dir,self.path))
+
+        if d.get('stride') != self.stride or d.get('path') != str(self.path.absolute()):
+            return
+
+        self.ino = d['ino']
+        self.times = d['times']
+        self.offsets = d['offsets']
+        self.lines = d['lines']
+        self.end = d['end']
+        self.last_time = d['last_time']
+        self.header = d['header']
+        self._dirty = False
+
+    def set_header(self,header):
+
+        if header != self.header:
+            self.header = header
+            self._dirty = True
+
+    def save(self):
+        """Write the sidecar file, if the index has changed. The index is
+        only a cache, failing to write it is not an error.
+        """
+        if self.index_dir is None or not self._dirty:
+            return
+
+        d = {
+            'path': str(self.path.absolute()),
+            'stride': self.stride,
+            'ino': self.ino,
+            'times': self.times,
+            'offsets': self.offsets,
+            'lines': self.lines,
+            'end': self.end,
+            'last_time': self.last_time,
+            'header': self.header,
+        }
+
+        target = index_path(self.index_dir,self.path)
+        tmp = target.with_suffix('.tmp')
+        try:
+            os.makedirs(self.index_dir,exist_ok=True)
+            with open(tmp,'w') as f:
+                json.dump(d,f)
+            os.replace(tmp,target)
+        except OSError:
+            return
+
+        self._dirty = False
+
+    def _valid(self,state):
+        """Check if the index still belongs to the file, which might have been
+        replaced or rewritten meanwhile.
+        """
+        if self.ino != state.ino or state.size < self.end:
+            return False
+
+        if self.offsets:
+            start = self.offsets[-1]
+            line = complete_lines(read_bytes(self.path,start,min(state.size,start + 4096)))
+            if line_time(line[:line.find(b'\n') + 1]) != self.times[-1]:
+                return False
+
+        return True
+
+    def sync(self,state):
+        """Index the lines written since the last sync.
+
+        Parameter
+        ---------
+
+        state : FileState
+            current state of the file
+        """
+        if not self._valid(state):
+            header = self.header
+            self._reset(state.ino)
+            self.header = header
+
+        with open(self.path,'rb') as f:
+            while self.end < state.size:
+                f.seek(self.end)
+                buf = complete_lines(f.read(min(self.chunk_size,state.size - self.end)))
+                # no complete line left (or one longer than a chunk)
+                if not buf:
+                    break
+                self.extend(buf,self.end)
+
+    def extend(self,buf,offset):
+        """Add the complete lines in buf, which are read from offset on.
+        Lines which do not follow on the indexed ones are ignored.
+        """
+        if offset != self.end or not buf:
+            return
+
+        arr = np.frombuffer(buf,dtype=np.uint8)
+        ends = np.flatnonzero(arr == ord('\n')) + 1
+        starts = np.concatenate([[0],ends[:-1]])
+
+        # the lines with a global line number divisible by the stride
+        first = -self.lines % self.stride
+        for begin,stop in zip(starts[first::self.stride],ends[first::self.stride]):
+            t = line_time(buf[begin:stop])
+            if t is not None:
+                self.times.append(t)
+                self.offsets.append(offset + int(begin))
+                self._dirty = True
+
+        for begin,stop in zip(starts[::-1],ends[::-1]):
+            t = line_time(buf[begin:stop])
+            if t is not None:
+                self.last_time = t
+                break
+
+        self.lines += len(starts)
+        self.end = offset + len(buf)
+
+    def offset(self,tmin):
+        """Byte offset of an indexed line before the first line with a time
+        of at least tmin. Parsing from there on yields all lines with
+        time >= tmin (and some before).
+        """
+        if tmin is None:
+            return 0
+
+        i = bisect.bisect_left(self.times,tmin)
+
+        return self.offsets[i - 1] if i > 0 else 0
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Background loading of the function object data.
+
+Scanning, parsing, filtering and the statistics are done in a worker thread.
+The results are handed to the GUI thread as immutable snapshots via a queued
+signal.
+"""
+
+import time
+import logging
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+
+from PyQt5.QtCore import QObject,QRunnable,QThreadPool,QCoreApplication,pyqtSignal
+
+from octopix.data.stats import describe
+from octopix.data.cancel import CancelToken,LoadCancelled
+from octopix.common.config import prefetch_order
+from octopix.data.window import select_columns,time_window
+
+
+logger = logging.getLogger(__name__)
+
+
+LoadRequest = namedtuple('LoadRequest',[
+    'case_dir',
+    'data_type',
+    'data_name',
+    'data_subset',
+    'default_subset',
+    'tmin',
+    'tmax',
+    'show_all',
+    'show_mean',
+])
+LoadRequest.__doc__ = """Everything a load depends on, i.e. the current selection in the GUI.
+The default_subset is shown, if data_subset is a selection of another data type."""
+
+
+DataSnapshot = namedtuple('DataSnapshot',[
+    'request',
+    'ppObjects',
+    'post_types',
+    'fields',
+    'data',
+    'full_data',
+    'mean_values',
+    'stats',
+    'error',
+    'token',
+    'files',
+])
+DataSnapshot.__doc__ = """The result of a load. The frames are views on the data of the reader,
+which is only ever replaced, never modified in place"""
+
+
+def change_token(request,ppObjects,file_state):
+    """Everything the displayed data depends on: the selection, the found
+    function objects and size, mtime and inode of the displayed files.
+    """
+    return (request,tuple((k,tuple(v)) for k,v in sorted(ppObjects.items())),file_state)
+
+
+def load_snapshot(request,scanner,readers,last_token=None,rescan=True,growth=None,cancel=None):
+    """Scan the postProcessing directory and load the data for the request.
+
+    Parameters
+    ----------
+
+    request : LoadRequest
+    scanner : OFppScanner
+    readers : ReaderCache
+    last_token : tuple
+        the token of the snapshot currently shown
+    rescan : bool
+        rescan all of postProcessing or only the invalidated directories
+    growth : GrowthTracker
+        observes the growth of the displayed files
+    cancel : CancelToken
+        checked between the steps and while parsing, raises LoadCancelled
+
+    Returns
+    -------
+
+    DataSnapshot, or None if nothing changed compared to last_token
+    """
+
+    scanner.scan(working_dir=request.case_dir,rescan=rescan)
+
+    ppObjects = {k:list(v) for k,v in scanner.ppObjects.items()}
+    post_types = list(scanner.post_types)
+
+    # nothing selected yet, e.g. on the first request, or the selection
+    # vanished: the scan only fills the data type combobox
+    if request.data_type not in ppObjects or request.data_name not in ppObjects[request.data_type]:
+        token = change_token(request,ppObjects,None)
+        if token == last_token:
+            return None
+        return DataSnapshot(request,ppObjects,post_types,[],pd.DataFrame(),None,None,pd.DataFrame(),None,token,())
+
+    if cancel is not None:
+        cancel.check()
+
+    reader = readers.get(request.case_dir,request.data_type,request.data_name)
+
+    # a prefetch job may still be busy with the reader
+    with reader.lock:
+        disk_state = reader.disk_state()
+
+        if growth is not None:
+            growth.observe(disk_state)
+
+        # nothing to parse, filter or draw if the files did not change
+        if last_token is not None and change_token(request,ppObjects,disk_state) == last_token:
+            return None
+
+        # the field names are known from the header, if a file with the same 
+        # header was loaded before
+        subset = request.data_subset
+        fields = reader.fields()
+        if subset and fields and not any(c in fields for c in subset):
+            subset = request.default_subset
+
+        # with the full data shown, the data before tmin is needed as well
+        reader.update(tmin=None if request.show_all else request.tmin,subset=subset,cancel=cancel)
+        readers.trim()
+
+        if cancel is not None:
+            cancel.check()
+
+        token = change_token(request,ppObjects,reader.state())
+        fields = reader.fields()
+
+        # the window, the full data, the mean and the stats share one projection
+        full = select_columns(reader.data,subset)
+
+    df = time_window(full,request.tmin,request.tmax)
+
+    if request.show_all and (request.tmin is not None or request.tmax is not None):
+        df_full = full
+    else:
+        df_full = None
+    stats = describe(df)
+    if request.show_mean and not stats.empty:
+        mean_values = stats['mean']
+    else:
+        mean_values = None
+
+    return DataSnapshot(request,ppObjects,post_types,fields,df,df_full,mean_values,stats,None,token,
+                        tuple(f.path for f in reader.state()))
+
+
+def prefetch_keys(case_dir,ppObjects,order=prefetch_order):
+    """The keys of the readers of all function objects, the data types in
+    order first.
+    """
+    data_types = [t for t in order if t in ppObjects] + [t for t in ppObjects if t not in order]
+
+    return [(Path(case_dir),data_type,data_name) for data_type in data_types for data_name in ppObjects[data_type]]
+
+
+def prefetch(keys,readers,budget,cancel=None,done=None):
+    """Load the data of the readers into the cache, while the cache holds
+    less than budget bytes. Readers, which were loaded before, are skipped.
+    Failures are only logged, the data is loaded again when it is selected.
+
+    Parameters
+    ----------
+
+    keys : list
+        the keys of the readers, see prefetch_keys()
+    readers : ReaderCache
+    budget : int
+        memory budget in bytes
+    cancel : CancelToken
+        checked while parsing, raises LoadCancelled
+    done : list
+        the keys are appended, once they are prefetched (or failed)
+    """
+    for key in keys:
+
+        if readers.nbytes() >= budget:
+            return
+
+        reader = readers.get(*key,prefetch=True)
+
+        with reader.lock:
+            if not reader.state():
+                try:
+                    reader.update(cancel=cancel)
+                except LoadCancelled:
+                    raise
+                except Exception:
+                    logger.debug('Prefetching %s failed',key,exc_info=True)
+
+        readers.trim()
+
+        if done is not None:
+            done.append(key)
+
+
+class LoaderSignals(QObject):
+
+    finished = pyqtSignal(object)
+
+
+class LoadJob(QRunnable):
+    """Runs load_snapshot() in the thread pool and emits the snapshot,
+    None if nothing changed or the job was cancelled, or a snapshot with the
+    error message if the load failed.
+    """
+
+    def __init__(self,request,scanner,readers,last_token=None,rescan=True,growth=None):
+
+        super(LoadJob,self).__init__()
+
+        self.request = request
+        self.scanner = scanner
+        self.readers = readers
+        self.last_token = last_token
+        self.rescan = rescan
+        self.growth = growth
+        self.cancel = CancelToken()
+        self.signals = LoaderSignals()
+
+    def run(self):
+
+        try:
+            snapshot = load_snapshot(self.request,self.scanner,self.readers,self.last_token,self.rescan,self.growth,self.cancel)
+        except LoadCancelled:
+            snapshot = None
+        except Exception as e:
+            # the found function objects are shown nevertheless
+            snapshot = DataSnapshot(self.request,
+                                    {k:list(v) for k,v in self.scanner.ppObjects.items()},
+                                    list(self.scanner.post_types),
+                                    None,None,None,None,None,
+                                    '{0:}: {1:}'.format(type(e).__name__,e),None,())
+
+        self.signals.finished.emit(snapshot)
+
+
+class PrefetchJob(QRunnable):
+    """Runs prefetch() in the thread pool and emits None, when it is done or
+    cancelled. The keys handled so far are in done.
+    """
+
+    def __init__(self,keys,readers,budget):
+
+        super(PrefetchJob,self).__init__()
+
+        self.keys = keys
+        self.readers = readers
+        self.budget = budget
+        self.done = []
+        self.cancel = CancelToken()
+        self.signals = LoaderSignals()
+
+    def run(self):
+
+        try:
+            prefetch(self.keys,self.readers,self.budget,self.cancel,self.done)
+        except LoadCancelled:
+            pass
+        except Exception:
+            logger.warning('Prefetching failed',exc_info=True)
+
+        self.signals.finished.emit(None)
+
+
+class Loader(QObject):
+    """Runs the load jobs, one at a time. Requests arriving while a job is
+    running are coalesced into a single pending one. If the running job is
+    for another request, it is cancelled: it stops at the next parsed chunk,
+    to free the CPU for the new one. Snapshots for a request, which is not
+    the most recent one, are discarded. If neither the request
+    nor the files changed since the last delivered snapshot, nothing is loaded.
+
+    After each job, jobFinished is emitted with its cost in seconds, from its
+    start until its snapshot is shown.
+
+    While no job is running, the readers of other function objects can be
+    prefetched by a job with the lowest priority, see prefetch(). It is
+    cancelled, once another selection is requested.
+
+    The scanner is only used from within the load jobs, the readers from
+    within the load and the prefetch jobs.
+
+    Parameter
+    ---------
+
+    scanner : OFppScanner
+    readers : ReaderCache
+    growth : GrowthTracker
+        observes the growth of the displayed files, None for no observation
+    """
+
+    snapshotReady = pyqtSignal(object)
+    jobFinished = pyqtSignal(float)
+
+    def __init__(self,scanner,readers,growth=None,parent=None):
+
+        super(Loader,self).__init__(parent)
+
+        self.scanner = scanner
+        self.readers = readers
+        self.growth = growth
+
+        self.pool = QThreadPool(self)
+
+        self.current = None
+        self._running = None
+        self._prefetching = None
+        self._prefetch = None
+        self._paused = False
+        self._started = None
+        self._pending = None
+        self._force = False
+        self._rescan = False
+        self._last_token = None
+
+    def busy(self):
+        return self._running is not None
+
+    def request(self,request,force=False,rescan=True):
+        """Load the data for the given request in the background. With force,
+        the snapshot is delivered even if nothing changed. Without rescan, 
+        only the invalidated directories of postProcessing are scanned.
+        """
+
+        # a new selection comes before the prefetch, an update of the
+        # current one runs alongside it
+        if self._prefetching is not None and request != self.current:
+            self._prefetching.cancel.cancel()
+
+        self.current = request
+        self._force = self._force or force
+        self._rescan = self._rescan or rescan
+
+        if self._running is not None:
+            self._pending = request
+            if request != self._running.request and not self._running.cancel.cancelled():
+                self._cancel(self._running)
+        else:
+            self._start(request)
+
+    def _cancel(self,job):
+        """Cancel a superseded job, the pending job scans and reloads in its place."""
+
+        self._force = self._force or job.last_token is None
+        self._rescan = self._rescan or job.rescan
+        job.cancel.cancel()
+
+    def prefetch(self,keys,budget):
+        """Prefetch the readers with the given keys into the cache, while it
+        holds less than budget bytes. The prefetch starts, once the loader is
+        idle, and is resumed after it was cancelled. Only a new list of keys
+        starts it anew.
+        """
+        if self._prefetch is not None and self._prefetch[0] == keys and self._prefetch[1] == budget:
+            return
+
+        # the running job is resumed with the new keys
+        if self._prefetching is not None:
+            self._prefetching.cancel.cancel()
+
+        self._prefetch = (keys,budget,list(keys))
+        self._start_prefetch()
+
+    def wait(self):
+        """Block until all jobs are done and their snapshots are delivered.
+        The prefetch is cancelled meanwhile.
+        """
+        self._paused = True
+
+        if self._prefetching is not None:
+            self._prefetching.cancel.cancel()
+
+        while self._running is not None or self._prefetching is not None:
+            self.pool.waitForDone()
+            QCoreApplication.processEvents()
+
+        self._paused = False
+
+    def shutdown(self):
+        """Cancel the running jobs and block until they have stopped. The
+        pending request and the prefetch are dropped, no snapshots are
+        delivered anymore.
+        """
+        self.current = None
+        self._pending = None
+        self._prefetch = None
+        self._paused = True
+
+        for job in (self._running,self._prefetching):
+            if job is not None:
+                job.cancel.cancel()
+
+        self.pool.waitForDone()
+
+    def _start_prefetch(self):
+
+        if self._paused or self._running is not None or self._prefetching is not None:
+            return
+
+        if self._prefetch is None or not self._prefetch[2]:
+            return
+
+        keys,budget,remaining = self._prefetch
+
+        job = PrefetchJob(remaining,self.readers,budget)
+        job.signals.finished.connect(self._on_prefetched)
+
+        self._prefetching = job
+        self.pool.start(job,-1)
+
+    def _on_prefetched(self,_):
+
+        job,self._prefetching = self._prefetching,None
+
+        # dropped by shutdown()
+        if self._prefetch is None:
+            return
+
+        keys,budget,remaining = self._prefetch
+        if job.cancel.cancelled():
+            remaining = [key for key in remaining if key not in job.done]
+        else:
+            remaining = []
+        self._prefetch = (keys,budget,remaining)
+
+        self._start_prefetch()
+
+    def _start(self,request):
+
+        last_token = None if self._force else self._last_token
+        rescan = self._rescan
+        self._force = False
+        self._rescan = False
+
+        job = LoadJob(request,self.scanner,self.readers,last_token,rescan,self.growth)
+        job.signals.finished.connect(self._on_finished)
+
+        self._running = job
+        self._started = time.perf_counter()
+        self.pool.start(job)
+
+    def _on_finished(self,snapshot):
+
+        self._running = None
+
+        if snapshot is not None and snapshot.request == self.current:
+            self._last_token = snapshot.token
+            self.snapshotReady.emit(snapshot)
+
+        # the snapshot is drawn by now, the slots are called directly
+        cost = time.perf_counter() - self._started
+
+        # the pending request is started after the delivery, so the
+        # scanner is not in use while the snapshot is applied
+        if self._pending is not None and self._running is None:
+            request,self._pending = self._pending,None
+            self._start(request)
+
+        self._start_prefetch()
+
+        self.jobFinished.emit(cost)
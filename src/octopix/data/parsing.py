@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tokenizing of the plain text .dat files written by OpenFOAM's function objects.
+
+The field names are always taken from the octopost reader, the functions here
+only turn (appended) data lines into rows. Vector and tensor entries like
+(1.2e3 4.5 6.7) are flattened, i.e. the brackets are treated as white space.
+
+Several engines turn the lines into values. Their speed depends on the shape
+of the data, see pick_engine(). pyarrow is optional.
+"""
+
+import io
+import re
+import time
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pyarrow = None
+
+_brackets = bytes.maketrans(b'()',b'  ')
+
+na_values = ['N/A']
+
+
+def complete_lines(buf):
+    """Return the part of buf up to and including the last newline, i.e.
+    without a line which is still being written.
+    """
+    return buf[:buf.rfind(b'\n') + 1]
+
+
+def read_bytes(path,start,end):
+    """Read the byte range [start,end) of a file."""
+    with open(path,'rb') as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def line_time(line):
+    """Return the time value of a single data line, or None for comment
+    and empty lines.
+    """
+    tokens = line.translate(_brackets).split(None,1)
+    if not tokens or tokens[0].startswith(b'#'):
+        return None
+    try:
+        return float(tokens[0])
+    except ValueError:
+        return None
+
+
+def last_line_width(buf):
+    """Return the number of values in the last data line of buf, None if
+    there is no data line.
+    """
+    end = len(buf)
+    while end > 0:
+        begin = buf.rfind(b'\n',0,end - 1) + 1
+        tokens = buf[begin:end].translate(_brackets).split()
+        if tokens and not tokens[0].startswith(b'#'):
+            return len(tokens)
+        end = begin
+    return None
+
+
+def _read_pandas(text,usecols,ncols):
+    """pandas' C parser, which is tolerant to lines with missing values."""
+    try:
+        raw = pd.read_csv(
+            io.BytesIO(text),
+            sep=r'\s+',
+            header=None,
+            comment='#',
+            na_values=na_values,
+            usecols=usecols,
+            dtype=np.float64,
+        )
+    except pd.errors.EmptyDataError:
+        return np.empty((0,ncols))
+    except (pd.errors.ParserError,ValueError,TypeError):
+        return None
+
+    return raw.to_numpy(dtype=np.float64)
+
+
+def _read_numpy(text,usecols,ncols):
+    """numpy's C loadtxt, a single pass over the buffer after the brackets
+    and N/A are replaced in bulk. Lines with a different number of values
+    are an error.
+    """
+    if b'N/A' in text:
+        text = text.replace(b'N/A',b'nan')
+    try:
+        with warnings.catch_warnings():
+            # on empty input
+            warnings.simplefilter('ignore',UserWarning)
+            values = np.loadtxt(io.BytesIO(text),dtype=np.float64,comments='#',usecols=usecols,ndmin=2)
+    except ValueError:
+        return None
+
+    if values.size == 0:
+        return np.empty((0,ncols))
+
+    return values
+
+
+_comment_lines = re.compile(rb'(?m)^[ \t]*#.*\n')
+_blanks = re.compile(rb'[ \t]+')
+_line_blanks = re.compile(rb'(?m)^ | $')
+
+
+def _read_pyarrow(text,usecols,ncols):
+    """pyarrow's multithreaded CSV reader. It knows neither comments nor white
+    space as delimiter, hence comment lines are removed and the blanks are 
+    reduced to single spaces first.
+    """
+    text = _line_blanks.sub(b'',_blanks.sub(b' ',_comment_lines.sub(b'',text)))
+
+    width = last_line_width(text)
+    if width is None:
+        return np.empty((0,ncols))
+
+    names = ['c{0:}'.format(i) for i in range(width)]
+    try:
+        table = pa_csv.read_csv(
+            io.BytesIO(text),
+            read_options=pa_csv.ReadOptions(column_names=names),
+            parse_options=pa_csv.ParseOptions(delimiter=' '),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name:pyarrow.float64() for name in names},
+                null_values=na_values,
+                include_columns=[names[i] for i in usecols] if usecols is not None else None,
+            ),
+        )
+    except (pyarrow.ArrowInvalid,IndexError):
+        return None
+
+    return np.column_stack([c.to_numpy() for c in table.columns]) if table.num_rows else np.empty((0,ncols))
+
+
+engines = {
+    'pandas': _read_pandas,
+    'numpy': _read_numpy,
+}
+
+if pyarrow is not None:
+    engines['pyarrow'] = _read_pyarrow
+
+default_engine = 'pandas'
+
+
+# the lines are parsed in chunks of about this size in bytes, a load can be
+# cancelled in between
+chunk_size = 16*1024*1024
+
+
+def _chunks(buf,size):
+    """Split buf into complete lines of about size bytes, at least one chunk."""
+
+    begin = 0
+    while True:
+        end = buf.find(b'\n',begin + size) + 1 or len(buf)
+        yield buf[begin:end]
+        if end >= len(buf):
+            break
+        begin = end
+
+
+def parse_lines(buf,columns,index_name=None,usecols=None,engine=None,cancel=None):
+    """Parse complete data lines into a DataFrame indexed by time.
+
+    Parameters
+    ----------
+
+    buf : bytes
+        complete lines of a .dat file, comment lines are skipped
+    columns : list
+        the field names, i.e. all columns except the time
+    index_name : str
+        name of the time index
+    usecols : list
+        the fields to convert, None for all. The other columns are only
+        tokenized.
+    engine : str
+        one of engines, by default default_engine. If the engine fails,
+        the lines are parsed again by pandas.
+    cancel : CancelToken
+        checked before each chunk, raises LoadCancelled
+
+    Returns
+    -------
+
+    DataFrame or None, if the lines do not match the given columns
+
+    """
+    ncols = len(columns) + 1
+
+    if usecols is None:
+        positions = list(range(ncols))
+    else:
+        positions = [0] + [i + 1 for i,c in enumerate(columns) if c in usecols]
+        # only the used columns are seen by the parser, the layout is
+        # checked with the last line
+        width = last_line_width(buf)
+        if width is not None and width != ncols:
+            return None
+
+    used = positions if usecols is not None else None
+    engine = engine or default_engine
+
+    parts = []
+    for chunk in _chunks(buf,chunk_size):
+        if cancel is not None:
+            cancel.check()
+
+        text = chunk.translate(_brackets)
+        values = engines[engine](text,used,len(positions))
+        if values is None and engine != 'pandas':
+            values = _read_pandas(text,used,len(positions))
+
+        if values is None or values.shape[1] != len(positions):
+            return None
+
+        parts.append(values)
+
+    values = parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    index = pd.Index(values[:,0],name=index_name)
+    return pd.DataFrame(values[:,1:],index=index,columns=[columns[i - 1] for i in positions[1:]])
+
+
+# size of the beginning of a file, on which the engines are compared
+sample_size = 256*1024
+
+_picked = {}
+_picked_lock = threading.Lock()
+
+
+def benchmark_engines(buf,repeat=3):
+    """Time the engines on the complete lines in buf.
+
+    Returns
+    -------
+
+    dict of the best time in seconds by engine, only the engines which give
+    the same values as pandas
+    """
+    width = last_line_width(buf)
+    if width is None:
+        return {}
+
+    columns = ['c{0:}'.format(i) for i in range(1,width)]
+    reference = parse_lines(buf,columns,engine='pandas')
+
+    times = {}
+    for name in engines:
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            df = parse_lines(buf,columns,engine=name)
+            dt = time.perf_counter() - t0
+            best = dt if best is None else min(best,dt)
+        if df is not None and reference is not None and df.shape == reference.shape and np.allclose(
+            df.to_numpy(),reference.to_numpy(),equal_nan=True
+        ):
+            times[name] = best
+
+    return times
+
+
+def pick_engine(data_type,path):
+    """Return the fastest engine for a data type, benchmarked once on the
+    beginning of one of its files.
+    """
+    with _picked_lock:
+        if data_type in _picked:
+            return _picked[data_type]
+
+    try:
+        with open(path,'rb') as f:
+            buf = complete_lines(f.read(sample_size))
+    except OSError:
+        return default_engine
+
+    times = benchmark_engines(buf)
+    name = min(times,key=times.get) if times else default_engine
+
+    with _picked_lock:
+        return _picked.setdefault(data_type,name)
+
+
+def choose_engine(name,data_type,path):
+    """Resolve the configured engine name: 'auto' (or None, or an engine
+    which is not available) picks the fastest one for the data type.
+    """
+    if name in engines:
+        return name
+    if path is None:
+        return default_engine
+
+    return pick_engine(data_type,path)
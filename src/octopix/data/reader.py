@@ -0,0 +1,680 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Append-aware reading of the function object data.
+
+OpenFOAM only ever appends to the .dat files of a running simulation, hence
+after the first (full) load only the newly written lines need to be parsed.
+"""
+
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from octopix.data.scanner import find_dat_paths
+from octopix.data.parsing import complete_lines,read_bytes,line_time,parse_lines,choose_engine
+from octopix.data.lineindex import LineIndex
+from octopix.data.diskcache import entry_dir,write_data,read_data
+from octopix.data.window import merge_segments
+from octopix.data.header import header_cache
+from octopix.data.columnstore import ColumnStore
+
+from octopost.reader import makeRuntimeSelectableReader
+
+
+class FileState(namedtuple('FileState',['path','ino','size','mtime_ns'])):
+    """Identity and size of a data file at the time it was read."""
+
+    __slots__ = ()
+
+    @classmethod
+    def of(cls,path):
+        st = os.stat(path)
+        return cls(Path(path),st.st_ino,st.st_size,st.st_mtime_ns)
+
+
+def projection(subset,columns):
+    """Return the columns in subset (in the order of columns), None for all
+    columns, if subset is empty or contains none of them.
+    """
+    used = [c for c in columns if c in subset] if subset else []
+
+    return used if used and len(used) < len(columns) else None
+
+
+class TailReader(object):
+    """Reader for the data of one function object, which keeps the parsed data
+    and the byte offset into the newest .dat file between two calls of update().
+
+    The full load is done by the octopost reader, which also defines the field
+    names. Afterwards only complete lines appended to the newest file are parsed
+    and appended to the data, which is kept in a ColumnStore. If a file was replaced or truncated, or if the
+    appended lines do not match the loaded columns, the data is fully reloaded.
+
+    With a cache directory, the parsed data and the line indices of the files
+    are kept there. On a later full load, the stored data is memory mapped and
+    only the lines appended since are parsed. If only the data from some time
+    on is needed and nothing is stored, it is parsed starting at the offset
+    given by the line index. Likewise, if only some fields are needed, only
+    their columns are parsed. The field names are then known from the index
+    or from the header cache, i.e. from an earlier full load of the file or
+    of a file with the same header.
+
+    Parameter
+    ---------
+
+    data_type : str
+        name of the data type, e.g 'forces', which defines the octopost reader
+    data_name : str
+        name of the function object, e.g. 'forces_aft'
+    case_dir : Path-like
+        the postProcessing parents directory
+    cache_dir : Path-like
+        directory for the parsed data and the line indices, None for no
+        on-disk cache
+    engine : str
+        the engine for parsing the lines, see octopix.data.parsing.engines.
+        None or 'auto' for the fastest one for the data type.
+    precision : str
+        'float32' to keep the values in single precision, the times are
+        always kept in float64. None or 'float64' for double precision.
+    """
+
+    # size of the chunk read from the end of the newest file to find the
+    # position of the last loaded line
+    locate_chunk_size = 64*1024
+
+    def __init__(self,data_type,data_name,case_dir,cache_dir=None,engine=None,precision=None):
+
+        self.data_type = data_type
+        self.data_name = data_name
+        self.case_dir = Path(case_dir)
+
+        if cache_dir is not None:
+            self.index_dir = Path(cache_dir,'index')
+            self.data_dir = Path(cache_dir,'data')
+        else:
+            self.index_dir = None
+            self.data_dir = None
+
+        self._headers = header_cache(cache_dir)
+        self.engine = engine
+        self._engine = None
+        self.dtype = ColumnStore.value_dtype(precision)
+
+        # held while the reader is updated and its data is taken, by the
+        # load and the prefetch jobs
+        self.lock = threading.Lock()
+
+        self._columnstore = None
+        self.data = pd.DataFrame()
+        self._fields = []
+
+        # all columns of the files, self.data may hold only some of them
+        self._columns = []
+        self._index_name = None
+
+        # state of the .dat files at the last read and the position of
+        # the first unparsed byte in the newest file
+        self._files = []
+        self._offset = 0
+        self._tailable = False
+
+        # the data is loaded from (about) this time on, None for all data
+        self.tmin = None
+        self._indices = {}
+
+        # number of rows in the on-disk cache
+        self._stored_rows = 0
+
+    def key(self):
+        return (self.case_dir,self.data_type,self.data_name)
+
+    @property
+    def data(self):
+        """The loaded data, the frame shares the memory of the column store."""
+        return self._frame
+
+    @data.setter
+    def data(self,df):
+
+        try:
+            self._columnstore = ColumnStore.from_frame(df,self.dtype)
+        except (TypeError,ValueError):
+            # e.g. non-numeric columns, which are never tail-read
+            self._columnstore = None
+            self._frame = df
+            return
+
+        self._frame = self._columnstore.frame()
+
+    def _append(self,rows):
+
+        if self.data.empty:
+            self.data = rows
+        elif self._columnstore is None:
+            self.data = pd.concat([self.data,rows])
+        else:
+            self._columnstore.append(
+                rows.index.to_numpy(dtype=np.float64),
+                rows[self._columnstore.columns].to_numpy(dtype=self.dtype),
+            )
+            self._frame = self._columnstore.frame()
+
+    def nbytes(self):
+        """Memory allocated for the data in bytes."""
+
+        if self._columnstore is not None:
+            return self._columnstore.nbytes()
+        if self._frame.empty:
+            return 0
+
+        return int(self._frame.memory_usage(index=True,deep=False).sum())
+
+    def fields(self):
+        """The field names. Before the first load, they are taken from the
+        header of the newest file, if it is known.
+        """
+        if not self._fields:
+            paths = find_dat_paths(self.data_type,self.data_name,self.case_dir)
+            if paths:
+                return list(self._known_header(paths[-1]).get('fields',[]))
+
+        return list(self._fields)
+
+    def _known_header(self,path):
+        """The names of the columns and fields of a file as found by an earlier 
+        full load, an empty dict if unknown.
+        """
+        if self.index_dir is not None:
+            header = self._line_index(path).header
+            if header:
+                return header
+
+        return self._headers.get(self.data_type,path) or {}
+
+    def state(self):
+        """The state of the data files as of the last read."""
+        return tuple(self._files)
+
+    def disk_state(self):
+        """The current state of the data files, only costs a few stat calls.
+        None, if a file vanished meanwhile.
+        """
+        try:
+            return tuple(FileState.of(p) for p in find_dat_paths(self.data_type,self.data_name,self.case_dir))
+        except FileNotFoundError:
+            return None
+
+    def get_data(self,tmin=None,subset=None):
+        """Like octopost's reader.get_data(): updates and returns the data."""
+        self.update(tmin,subset)
+        return self.data
+
+    def _parse_engine(self):
+
+        if self._engine is None:
+            paths = find_dat_paths(self.data_type,self.data_name,self.case_dir)
+            self._engine = choose_engine(self.engine,self.data_type,paths[-1] if paths else None)
+
+        return self._engine
+
+    def _line_index(self,path):
+
+        if path not in self._indices:
+            self._indices[path] = LineIndex(path,self.index_dir)
+
+        return self._indices[path]
+
+    def load(self,tmin=None,subset=None,cancel=None):
+        """Full (re)load of all data files, or only of the data from tmin on
+        and of the fields in subset, if the line indices allow for it.
+        """
+        # the stored data is only taken on the first load, a reload is due to
+        # rewritten files or unexpected lines
+        if not self._files and self.data_dir is not None and self._load_stored():
+            self.update(tmin,subset,cancel)
+            return
+
+        # only a window holding all data (and columns) is stored
+        if (tmin is not None or subset) and self.index_dir is not None and self._load_window(tmin,subset,cancel):
+            self._store()
+            return
+
+        if cancel is not None:
+            cancel.check()
+
+        reader = makeRuntimeSelectableReader(reader_name=self.data_type, base_dir=self.data_name, case_dir=self.case_dir)
+
+        # the octopost reader cannot be interrupted, but the rest is skipped
+        if cancel is not None:
+            cancel.check()
+
+        self.data = reader.data
+        self._fields = reader.fields()
+        self._columns = list(self.data.columns)
+        self._index_name = self.data.index.name
+
+        try:
+            self._files = [FileState.of(p) for p in find_dat_paths(self.data_type,self.data_name,self.case_dir)]
+        except FileNotFoundError:
+            self._files = []
+
+        if self._files:
+            self._offset,self._tailable = self._locate_offset()
+        else:
+            self._offset,self._tailable = 0,False
+
+        self.tmin = None
+
+        if self.index_dir is not None:
+            self._update_indices()
+
+        self._store()
+
+    def _entry_dir(self):
+        return entry_dir(self.data_dir,(self.case_dir.absolute(),self.data_type,self.data_name))
+
+    def _store(self):
+        """Write the complete data to the on-disk cache."""
+
+        if (
+            self.data_dir is None 
+            or not self._tailable 
+            or self.tmin is not None 
+            or self.data.empty
+            or list(self.data.columns) != self._columns
+        ):
+            return
+
+        if write_data(self._entry_dir(),self.data,self._files,self._offset,self._fields,dtype=self.dtype):
+            self._stored_rows = len(self.data)
+
+    def _load_stored(self):
+        """Open the data stored by an earlier load, if the files were only
+        appended since.
+
+        Returns
+        -------
+
+        bool : False, if there is no valid stored data
+        """
+        stored = read_data(self._entry_dir())
+
+        if stored is None:
+            return False
+
+        data,meta = stored
+
+        # stored with another precision
+        if (data.dtypes != self.dtype).any():
+            return False
+        files = [FileState(Path(p),ino,size,mtime_ns) for p,ino,size,mtime_ns in meta['files']]
+        offset = meta['offset']
+
+        try:
+            states = [FileState.of(p) for p in find_dat_paths(self.data_type,self.data_name,self.case_dir)]
+        except FileNotFoundError:
+            return False
+
+        # files of restarted runs added since are read by update()
+        if [f.path for f in states[:len(files)]] != [f.path for f in files]:
+            return False
+
+        newest,last = states[len(files) - 1],files[-1]
+
+        if states[:len(files) - 1] != files[:-1] or newest.ino != last.ino or newest.size < offset:
+            return False
+
+        # a file rewritten in place keeps its inode, the last stored line
+        # has to be still there
+        buf = read_bytes(newest.path,max(0,offset - 4096),offset)
+        if line_time(buf[buf.rfind(b'\n',0,len(buf) - 1) + 1:]) != data.index[-1]:
+            return False
+
+        self.data = data
+        self._fields = list(meta['fields'])
+        self._columns = list(meta['columns'])
+        self._index_name = meta['index_name']
+        self._files = files
+        self._offset,self._tailable = offset,True
+        self.tmin = None
+        self._stored_rows = len(data)
+
+        return True
+
+    def _update_indices(self):
+        """Bring the line indices up to date after a full load. The columns are
+        only kept, if the appended lines are parsed like octopost does.
+        """
+        if self._tailable:
+            header = {
+                'columns': [str(c) for c in self._columns],
+                'index_name': self._index_name,
+                'fields': [str(f) for f in self._fields],
+            }
+        else:
+            header = {}
+
+        for state in self._files:
+            index = self._line_index(state.path)
+            index.set_header(header)
+            index.sync(state)
+            index.save()
+            if header:
+                self._headers.put(self.data_type,state.path,header)
+
+    def _load_window(self,tmin,subset=None,cancel=None):
+        """Parse the data from about tmin on, starting at the offsets given by
+        the line indices of the files, and only the columns of subset.
+
+        Returns
+        -------
+
+        bool : False, if there are no indices for a load without octopost
+        """
+        try:
+            states = [FileState.of(p) for p in find_dat_paths(self.data_type,self.data_name,self.case_dir)]
+        except FileNotFoundError:
+            return False
+
+        if not states:
+            return False
+
+        indices = [self._line_index(state.path) for state in states]
+        header = self._known_header(states[-1].path)
+
+        if not header:
+            return False
+
+        usecols = projection(subset,header['columns'])
+
+        # a window starting at the first line holds all data
+        complete = True
+        segments = []
+        for i,(state,index) in enumerate(zip(states,indices)):
+            index.set_header(header)
+            index.sync(state)
+            index.save()
+
+            # files of earlier runs ending before tmin are skipped
+            if tmin is not None and i < len(states) - 1 and (index.last_time is None or index.last_time < tmin):
+                complete = False
+                continue
+
+            start = index.offset(tmin)
+            complete = complete and start == 0
+            buf = complete_lines(read_bytes(state.path,start,state.size))
+            rows = parse_lines(buf,header['columns'],header['index_name'],usecols=usecols,engine=self._parse_engine(),cancel=cancel)
+
+            if rows is None:
+                return False
+
+            segments.append(rows)
+
+        self.data = merge_segments(segments)
+        self._fields = list(header['fields'])
+        self._columns = list(header['columns'])
+        self._index_name = header['index_name']
+        self._files = states
+        self._offset,self._tailable = start + len(buf),True
+        self.tmin = None if complete else tmin
+
+        return True
+
+    def update(self,tmin=None,subset=None,cancel=None):
+        """Read the lines appended since the last call.
+
+        Parameters
+        ----------
+
+        tmin : float
+            the data is needed from this time on, None for all data
+        subset : list
+            the fields needed, None (or none of the fields) for all
+        cancel : CancelToken
+            checked while parsing, raises LoadCancelled. The reader stays
+            consistent, the lines which were not completely parsed are
+            read by the next update.
+
+        Returns
+        -------
+
+        bool : True if the data has changed
+        """
+
+        paths = find_dat_paths(self.data_type,self.data_name,self.case_dir)
+        n = len(self._files)
+
+        # newly selected fields are loaded in addition to the loaded ones
+        if self._files and subset and not self._covers(subset):
+            subset = list(self.data.columns) + [c for c in subset if c not in self.data.columns]
+
+        # files of restarted runs are appended, any other change needs a reload
+        if (
+            not self._files 
+            or paths[:n] != [f.path for f in self._files]
+            or (self.tmin is not None and (tmin is None or tmin < self.tmin))
+            or not self._covers(subset)
+        ):
+            self.load(tmin,subset,cancel)
+            return True
+
+        try:
+            states = [FileState.of(p) for p in paths]
+        except FileNotFoundError:
+            self.load(tmin,subset,cancel)
+            return True
+
+        changed = self._tail(states[:n],cancel)
+
+        if changed is not None and len(states) > n:
+            changed = self._read_restarts(states[n:],cancel)
+
+        if changed is None:
+            self.load(tmin,subset,cancel)
+            return True
+
+        # rewriting the stored data only pays off, once it has grown considerably
+        if changed and len(self.data) >= 2*self._stored_rows:
+            self._store()
+
+        return changed
+
+    def _covers(self,subset):
+        """Check if the loaded columns include the fields in subset."""
+
+        needed = projection(subset,self._columns)
+        loaded = list(self.data.columns)
+
+        if needed is None:
+            return loaded == self._columns
+
+        return all(c in loaded for c in needed)
+
+    def _usecols(self):
+        """The loaded columns, None if all are loaded."""
+
+        loaded = list(self.data.columns)
+
+        return None if loaded == self._columns else loaded
+
+    def _tail(self,states,cancel=None):
+        """Parse the lines appended to the newest file.
+
+        Parameter
+        ---------
+
+        states : list of FileState
+            the current state of the files read so far
+        cancel : CancelToken
+
+        Returns
+        -------
+
+        bool : True if the data has changed, None if a reload is needed
+        """
+        newest = states[-1]
+        last = self._files[-1]
+
+        # older files are closed, any modification means they were rewritten
+        if states[:-1] != self._files[:-1] or newest.ino != last.ino or newest.size < self._offset:
+            return None
+
+        if newest.size == last.size and newest.mtime_ns == last.mtime_ns:
+            return False
+
+        if not self._tailable:
+            return None
+
+        buf = complete_lines(read_bytes(newest.path,self._offset,newest.size))
+
+        if not buf:
+            self._files[-1] = newest
+            return False
+
+        rows = parse_lines(buf,self._columns,self._index_name,usecols=self._usecols(),engine=self._parse_engine(),cancel=cancel)
+
+        if rows is None:
+            return None
+
+        self._files[-1] = newest
+
+        if self.index_dir is not None:
+            index = self._line_index(newest.path)
+            index.extend(buf,self._offset)
+            index.save()
+
+        self._offset += len(buf)
+
+        if rows.empty:
+            return False
+
+        # a restart, whose file was first seen with its header only, replaces
+        # the data from its first time on
+        if not self.data.empty and rows.index[0] <= self.data.index[-1]:
+            self.data = merge_segments([self.data,rows])
+        else:
+            self._append(rows)
+
+        return True
+
+    def _read_restarts(self,states,cancel=None):
+        """Read the files of restarted runs, which were added after the newest
+        file. Each restart replaces the data from its first time on.
+
+        Returns
+        -------
+
+        bool : True, None if a reload is needed
+        """
+        if not self._tailable:
+            return None
+
+        segments = [self.data]
+
+        for state in states:
+            buf = complete_lines(read_bytes(state.path,0,state.size))
+            rows = parse_lines(buf,self._columns,self._index_name,usecols=self._usecols(),engine=self._parse_engine(),cancel=cancel)
+
+            if rows is None:
+                return None
+
+            if self.index_dir is not None:
+                index = self._line_index(state.path)
+                index.set_header(self._line_index(self._files[-1].path).header)
+                index.sync(state)
+                index.save()
+
+            segments.append(rows)
+
+        self.data = merge_segments(segments)
+        self._files.extend(states)
+        self._offset = len(buf)
+
+        return True
+
+    def _matches(self,line):
+        """Check if a single data line parses to the same row as loaded by octopost."""
+
+        row = parse_lines(line,self.data.columns,engine=self._parse_engine())
+
+        if row is None or row.empty:
+            return False
+
+        t = row.index[0]
+
+        if t not in self.data.index:
+            return False
+
+        loaded = self.data.loc[[t]].to_numpy(dtype=np.float64)[-1]
+
+        return np.allclose(row.to_numpy()[0],loaded,equal_nan=True)
+
+    def _locate_offset(self):
+        """Find the end of the last line of the newest file, which is contained
+        in the loaded data. The octopost reader may have seen less of the file
+        than we do now, or even a line still being written.
+
+        Returns
+        -------
+
+        (int, bool) : the offset and if appended lines can be parsed
+        """
+
+        newest = self._files[-1]
+
+        if self.data.empty:
+            return len(complete_lines(read_bytes(newest.path,0,newest.size))),True
+
+        t_last = self.data.index[-1]
+        chunk_size = self.locate_chunk_size
+
+        while True:
+            start = max(0,newest.size - chunk_size)
+            buf = read_bytes(newest.path,start,newest.size)
+
+            # the first line of the chunk might be incomplete
+            if start > 0:
+                skip = buf.find(b'\n') + 1
+                buf = buf[skip:]
+                start += skip
+
+            end = buf.rfind(b'\n') + 1
+            candidates = []
+
+            while end > 0:
+                begin = buf.rfind(b'\n',0,end - 1) + 1
+                t = line_time(buf[begin:end])
+                if t is not None:
+                    if t <= t_last:
+                        candidates.append((begin,end))
+                        if len(candidates) == 2:
+                            break
+                end = begin
+
+            if candidates or start == 0:
+                break
+            chunk_size *= 4
+
+        if not candidates:
+            # the newest file contains no loaded line (e.g. only the header after
+            # a restart), so everything in it is new
+            return 0,True
+
+        begin,end = candidates[0]
+        if self._matches(buf[begin:end]):
+            return start + end,True
+
+        # the last loaded row might stem from a line which was incomplete when
+        # octopost read the file. It is dropped and read again.
+        if len(candidates) == 2 and self._matches(buf[candidates[1][0]:candidates[1][1]]):
+            if line_time(buf[begin:end]) == t_last:
+                self.data = self.data.iloc[:-1]
+            return start + begin,True
+
+        return start + end,False
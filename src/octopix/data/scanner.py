@@ -1,25 +1,161 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-*-
 
+import os
+import time
+import threading
+from collections import namedtuple
 from pathlib import Path
 
 from octopix.data.funcs import flatten,is_unique
-from octopost.parsing import list_time_dirs
 from octopix.common.config import supported_post_types
 
+# postProcessing directories with more time directories than this (e.g. surfaces
+# or cuttingPlane) are validated by their own mtime only
+max_tracked_time_dirs = 16
+
+# mtimes this close to the scan are not trusted, as the file system
+# timestamps may be coarse
+mtime_slack_ns = 2*10**9
+
+
+def is_time_name(name):
+    try:
+        float(name)
+        return True
+    except ValueError:
+        return False
+
+
+def scan_time_dirs(path):
+    """Return the time directories in path as os.DirEntry, sorted by time.
+    The type information of scandir avoids a stat call per entry.
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = [e for e in it if is_time_name(e.name) and e.is_dir()]
+    except (FileNotFoundError,NotADirectoryError):
+        return []
+
+    return sorted(entries,key=lambda e: float(e.name))
+
+
+def dat_file_names(path):
+    """Return the sorted names of the .dat files in path."""
+    try:
+        with os.scandir(path) as it:
+            return sorted(e.name for e in it if e.name.endswith('.dat') and e.is_file())
+    except (FileNotFoundError,NotADirectoryError):
+        return []
+
+
 def get_pdirs(working_dir=Path.cwd()):
     
-    return [p.name for p in Path(working_dir/"postProcessing").glob('*')]
+    try:
+        with os.scandir(Path(working_dir,'postProcessing')) as it:
+            return [e.name for e in it if e.is_dir()]
+    except (FileNotFoundError,NotADirectoryError):
+        return []
+
+
+class PdirEntry(namedtuple('PdirEntry',['mtime_ns','tdir_mtimes','dat_files','settled'])):
+    """Scan result of a directory in postProcessing: its mtime, the mtimes of its
+    time directories (None if there are too many to track), the .dat files found 
+    (an empty list is cached as well) and if the mtimes were old enough to be
+    trusted.
+    """
+    
+    __slots__ = ()
+
+
+def scan_pdir(name,working_dir=Path.cwd()):
+    """Scan the time directories of postProcessing/<name> for .dat files.
+    
+    Returns
+    -------
+    
+    PdirEntry
+    """
+    path = os.path.join(working_dir,'postProcessing',name)
+    now = time.time_ns()
+    
+    # the mtimes are taken before listing, so that later changes are detected
+    mtime_ns = os.stat(path).st_mtime_ns
+    tdirs = scan_time_dirs(path)
+    
+    if len(tdirs) <= max_tracked_time_dirs:
+        tdir_mtimes = tuple((e.name,e.stat().st_mtime_ns) for e in tdirs)
+        newest = max([mtime_ns] + [m for _,m in tdir_mtimes])
+    else:
+        tdir_mtimes = None
+        newest = mtime_ns
+    
+    dat_files = flatten([dat_file_names(e.path) for e in tdirs])
+    
+    return PdirEntry(mtime_ns,tdir_mtimes,dat_files,now - newest > mtime_slack_ns)
 
 
-def find_dat_files(tdirs):
+def pdir_unchanged(entry,name,working_dir=Path.cwd()):
+    """Check with a few stat calls if the scan result of postProcessing/<name>
+    is still valid.
+    """
+    if not entry.settled:
+        return False
+    
+    path = os.path.join(working_dir,'postProcessing',name)
     
-    t = flatten([list(p.glob('*.dat')) for p in tdirs])
+    try:
+        if os.stat(path).st_mtime_ns != entry.mtime_ns:
+            return False
+        for tdir,mtime_ns in entry.tdir_mtimes or ():
+            if os.stat(os.path.join(path,tdir)).st_mtime_ns != mtime_ns:
+                return False
+    except FileNotFoundError:
+        return False
+    
+    return True
+
+
+def find_dat_paths(data_type,data_name,working_dir=Path.cwd()):
+    """
+    Return the paths of the .dat files written by a function object,
+    ordered by their time directory, i.e. after a restart the last path
+    is the file which is currently written.
+
+    Parameters
+    ----------
+
+    data_type : str
+        function object type, e.g. 'forces'
+    data_name : str
+        name of the function object (the entry in OFppScanner.ppObjects)
+    working_dir : Path-like
+        path to the postProcessing parents directory
+
+    Returns
+    -------
+
+    list of Path
+    """
+    if data_type is None or data_name is None:
+        return []
+
+    # see find_all_OF_ppObjects for the special layout of rigidBodyState
+    if data_type == 'rigidBodyState':
+        base_dir = Path(working_dir,'postProcessing','rigidBodyState')
+        pattern = data_name if data_name.endswith('.dat') else data_name + '.dat'
+    else:
+        base_dir = Path(working_dir,'postProcessing',data_name)
+        pattern = '*.dat'
+
+    paths = []
+    for tdir in scan_time_dirs(base_dir):
+        paths.extend(Path(tdir.path,name) for name in dat_file_names(tdir.path) if pattern in ('*.dat',name))
+
+    return paths
 
-    return [p.name for p in t]
-   
 
-def find_all_OF_ppObjects(supported_types,working_dir=Path.cwd()):
+def find_all_OF_ppObjects(supported_types,working_dir=Path.cwd(),pdir_dat_files=None):
     """
     Parses the postProcessing directory recursively in the given
     working directory for OpenFOAM's function object generated data files.
@@ -46,16 +182,21 @@ def find_all_OF_ppObjects(supported_types,working_dir=Path.cwd()):
         list of strings with the functionObject type names, which should be looked up. 
     working_dir : Path-like
         path to the postProcessing parents directory
+    pdir_dat_files : dict
+        the .dat file names found for each directory in postProcessing, see
+        scan_pdir. If not given, the postProcessing directory is scanned.
     Returns
     -------
     
     dict 
      
     """
+    if pdir_dat_files is None:
+        pdir_dat_files = {val:scan_pdir(val,working_dir).dat_files for val in get_pdirs(working_dir=working_dir)}
+    
     ppObjects = {k:[] for k in supported_types}
         
-    for val in get_pdirs(working_dir=working_dir):
-        dat_files = find_dat_files(list_time_dirs(Path(working_dir,'postProcessing',val)))
+    for val,dat_files in pdir_dat_files.items():
                 
         if dat_files and is_unique(dat_files):
              
@@ -85,9 +226,8 @@ def find_all_OF_ppObjects(supported_types,working_dir=Path.cwd()):
     # the file name does not contain the function object type, but instead the rigidBodySectionalForceProbes.
     
         
-    if 'rigidBodyState' in get_pdirs(working_dir):
-        dat_files = find_dat_files(list_time_dirs(Path(working_dir,'postProcessing','rigidBodyState')))
-        ppObjects['rigidBodyState'] = list(set(dat_files))
+    if 'rigidBodyState' in pdir_dat_files:
+        ppObjects['rigidBodyState'] = list(set(pdir_dat_files['rigidBodyState']))
     
     #ppObjects = {k:sorted(v,reverse=True) for (k,v) in ppObjects.items()}
     # for sorting we replace the underscore with the bracket, as the bracket is at the end of the sorting order
@@ -103,19 +243,60 @@ def find_all_OF_ppObjects(supported_types,working_dir=Path.cwd()):
 
 
 class OFppScanner(object):
+    """Keeps the function objects found in the postProcessing directory.
+    
+    The scan result of each directory in postProcessing is kept together with
+    its mtime (and those of its time directories). On a rescan, only 
+    directories with a changed mtime are scanned again, this includes the
+    directories without any .dat files (e.g. surfaces). Without rescan, only
+    new and invalidated directories are scanned.
+    """
     
     def __init__(self,supported_types,working_dir=Path.cwd()):
         
         self.supported_types = supported_types
         self.working_dir = working_dir
         
-        self.scan()
+        self._index = {}
+        self._invalid = set()
+        self._lock = threading.Lock()
+        
+        self.scan(working_dir=working_dir)
+    
+    def invalidate(self,name):
+        """Mark a directory in postProcessing as changed. Thread safe."""
+        with self._lock:
+            self._invalid.add(name)
     
-    def scan(self,working_dir=Path.cwd()):
+    def scan(self,working_dir=Path.cwd(),rescan=True):
+        
+        with self._lock:
+            invalid,self._invalid = self._invalid,set()
+        
+        if Path(working_dir) != Path(self.working_dir):
+            self._index = {}
         
         self.working_dir = working_dir
         
-        self.ppObjects = find_all_OF_ppObjects(self.supported_types, self.working_dir)
+        index = {}
+        for val in get_pdirs(working_dir=working_dir):
+            entry = self._index.get(val)
+            if (
+                entry is None 
+                or val in invalid 
+                or (rescan and not pdir_unchanged(entry,val,working_dir))
+            ):
+                try:
+                    entry = scan_pdir(val,working_dir)
+                except FileNotFoundError:
+                    continue
+            index[val] = entry
+        
+        self._index = index
+        
+        pdir_dat_files = {k:v.dat_files for k,v in index.items()}
+        
+        self.ppObjects = find_all_OF_ppObjects(self.supported_types, self.working_dir, pdir_dat_files)
         self.post_types = list(self.ppObjects.keys())
 
 
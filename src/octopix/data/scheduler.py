@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Scheduling of the updates: UI events, the autoupdate timer and file system events"""
+
+import time
+from collections import deque
+
+from PyQt5.QtCore import QObject,QTimer,QCoreApplication,pyqtSignal
+
+
+class UpdateScheduler(QObject):
+    """Central entry point for updates, which are run by the Loader.
+
+    Updates requested by the UI (typing a time, selecting fields, ...) are
+    debounced: they are run once the UI was quiet for the debounce interval.
+    Timer ticks and file system events arriving meanwhile are merged into
+    the pending update. The request is made when the update is run, so it
+    reflects the latest state of the UI. The Loader runs at most one job at
+    a time and coalesces the requests arriving while it is busy.
+
+    The autoupdate adapts to the cost of the updates: the next one starts
+    max(interval, cost_factor*last_cost) after the start of the last one,
+    see effective_interval(). Updates due to file system events are spaced
+    likewise, see event_interval(). With file system events, the polling is only the fallback and
+    runs at most every fallback_interval. The timer is single shot and only
+    restarted once the running job is done, ticks arriving while a job is
+    running are deferred until then. Hence, there is never more than one
+    tick on its way.
+
+    With a GrowthTracker, the interval of the polling is the one of the 
+    displayed files, i.e. it is backed off for idle or finished runs. A file
+    system event proves a change, hence it is not delayed by the back-off.
+
+    Parameter
+    ---------
+
+    loader : Loader
+    make_request : callable
+        returns the LoadRequest for the current selection
+    debounce : float
+        debounce interval in seconds
+    cost_factor : float
+        minimum ratio of the time between the updates to their cost
+    growth : GrowthTracker
+        the growth of the displayed files, as observed by the loader
+    fallback_interval : float
+        with file system events, the shortest polling interval in seconds,
+        None without file system events
+    """
+
+    # the effective autoupdate interval in seconds, changes with the cost
+    intervalChanged = pyqtSignal(float)
+
+    # number of automatic updates, over which their rate is measured
+    rate_window = 8
+
+    def __init__(self,loader,make_request,debounce=0.15,cost_factor=2.0,growth=None,fallback_interval=None,parent=None):
+
+        super(UpdateScheduler,self).__init__(parent)
+
+        self.loader = loader
+        self.make_request = make_request
+        self.loader.jobFinished.connect(self._on_finished)
+
+        self.interval = 1.0
+        self.cost_factor = cost_factor
+        self.growth = growth
+        self.fallback_interval = fallback_interval
+        self.last_cost = 0.0
+
+        # the autoupdate timer
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._on_timer)
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(int(debounce*1000))
+        self._debounce.timeout.connect(self._run)
+
+        self._active = False
+        self._last_start = None
+        self._auto_starts = deque(maxlen=self.rate_window)
+        self._deferred = False
+        self._timer_rescan = True
+        self._force = False
+        self._rescan = False
+
+    def effective_interval(self):
+        """The autoupdate interval in seconds, considering the growth of the
+        files and the cost of the updates.
+        """
+        interval = self.growth.delay() if self.growth is not None else self.interval
+
+        return max(interval,self.cost_factor*self.last_cost)
+
+    def event_interval(self):
+        """The shortest interval in seconds between updates due to file
+        system events, considering only the cost of the updates.
+        """
+        return max(self.interval,self.cost_factor*self.last_cost)
+
+    def poll_interval(self):
+        """The interval of the polling in seconds."""
+
+        if self.fallback_interval is None:
+            return self.effective_interval()
+
+        return max(self.effective_interval(),self.fallback_interval)
+
+    def rate(self):
+        """The measured rate of the automatic updates in Hz, None if there
+        were too few of them yet.
+        """
+        if len(self._auto_starts) < 2:
+            return None
+
+        rate = (len(self._auto_starts) - 1)/max(self._auto_starts[-1] - self._auto_starts[0],1e-6)
+
+        # a long pause since the last update lowers the rate as well
+        return min(rate,1.0/max(time.perf_counter() - self._auto_starts[-1],1e-6))
+
+    def set_interval(self,interval):
+        """The autoupdate interval in seconds."""
+
+        self.interval = interval
+        if self.growth is not None:
+            self.growth.interval = interval
+        self._plan(periodic=True)
+        self.intervalChanged.emit(self.effective_interval())
+
+    def start(self):
+
+        self._active = True
+        self._auto_starts.clear()
+        self._plan(periodic=True)
+
+    def stop(self):
+
+        self._active = False
+        self.timer.stop()
+
+    def cancel(self):
+        """Stop the autoupdate and drop the pending debounced update."""
+
+        self.stop()
+        self._debounce.stop()
+
+    def active(self):
+        return self._active
+
+    def pending(self):
+        return self._debounce.isActive()
+
+    def schedule(self,force=False,rescan=True):
+        """Update once the UI was quiet for the debounce interval."""
+
+        self._merge(force,rescan)
+        self._debounce.start()
+
+    def tick(self,rescan=True):
+        """Update due to a file system event, as soon as the event
+        interval allows for it, unless a debounced update is pending anyway.
+        """
+        self._merge(False,rescan)
+
+        if self._debounce.isActive():
+            return
+
+        if self.loader.busy():
+            self._deferred = True
+        elif self._wait_time(self.event_interval()) > 0:
+            self._plan(periodic=False,earlier_only=True)
+        else:
+            self._run(auto=True)
+
+    def request(self,force=False,rescan=True):
+        """Update now, including any pending update."""
+
+        self._merge(force,rescan)
+        self._run()
+
+    def wait(self):
+        """Run the pending update and block until all updates are done,
+        including those scheduled while the snapshots are delivered.
+        """
+        while True:
+            if self._debounce.isActive():
+                self._run()
+            self.loader.wait()
+            QCoreApplication.processEvents()
+            if not (self._debounce.isActive() or self.loader.busy()):
+                break
+
+    def _merge(self,force,rescan):
+        self._force = self._force or force
+        self._rescan = self._rescan or rescan
+
+    def _wait_time(self,spacing):
+        """Seconds until the next update may start."""
+
+        if self._last_start is None:
+            return spacing
+
+        return max(0.0,spacing - (time.perf_counter() - self._last_start))
+
+    def _plan(self,periodic,earlier_only=False):
+        """Start the timer for the next update, the periodic one or a
+        deferred one due to file system events. While a job is running, 
+        this is done once it is finished.
+        """
+        if not self._active or self.loader.busy():
+            return
+
+        spacing = self.poll_interval() if periodic else self.event_interval()
+        msec = int(self._wait_time(spacing)*1000)
+
+        if earlier_only and self.timer.isActive() and self.timer.remainingTime() <= msec:
+            return
+
+        # polling scans the whole postProcessing directory
+        self._timer_rescan = periodic
+        self.timer.start(msec)
+
+    def _on_timer(self):
+
+        # the debounced update comes first, the timer is restarted after it
+        if self._debounce.isActive():
+            return
+
+        self._merge(False,self._timer_rescan)
+
+        if self.loader.busy():
+            self._deferred = True
+        else:
+            self._run(auto=True)
+
+    def _on_finished(self,cost):
+
+        self.last_cost = cost
+        self.intervalChanged.emit(self.effective_interval())
+
+        if self._deferred:
+            self._deferred = False
+            self._plan(periodic=False)
+        else:
+            self._plan(periodic=True)
+
+    def _run(self,auto=False):
+
+        self._debounce.stop()
+        self.timer.stop()
+
+        force,rescan = self._force,self._rescan
+        self._force = False
+        self._rescan = False
+
+        self._last_start = time.perf_counter()
+        if auto:
+            self._auto_starts.append(self._last_start)
+        self.loader.request(self.make_request(),force=force,rescan=rescan)
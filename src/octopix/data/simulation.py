@@ -4,9 +4,9 @@
 import time
 from pathlib import Path
 
-from octopix.common.config import supported_post_types
+from octopix.common.config import supported_post_types,cache_dir
 from octopix.data.scanner import find_all_OF_ppObjects
-from octopost.reader import makeRuntimeSelectableReader
+from octopix.data.reader import TailReader
 
 
 class Simulation(object):
@@ -94,11 +94,11 @@ class Simulation(object):
                 
             for data_file in data_dict[data_type]:
                 if self.container[data_type][data_file] is None: 
-                    reader = makeRuntimeSelectableReader(reader_name=data_type, base_dir=data_file, case_dir=self.location)
+                    reader = TailReader(data_type,data_file,self.location,cache_dir=cache_dir())
                     self.container[data_type][data_file] = reader
 
 
-    def get_data(self,data_type,data_files=None):
+    def get_data(self,data_type,data_files=None,tmin=None):
         """
         
         this loads and gets, as reader.get_data() (re)loads and returns the data 
@@ -111,16 +111,19 @@ class Simulation(object):
         data_files : str of list(str)
             name(s) of the data files. If not given, i.e. None return all data files
             for given data type
+        tmin : float
+            the data is only needed from this time on, the returned data may
+            start somewhat earlier. None for all data.
         """
         
         if isinstance(data_files, str):
-            return self.container[data_type][data_files].get_data()
+            return self.container[data_type][data_files].get_data(tmin)
         elif isinstance(data_files, list):
-            return [self.container[data_type][data_file].get_data() for data_file in data_files]
+            return [self.container[data_type][data_file].get_data(tmin) for data_file in data_files]
         elif not data_files:
             print('returning all data_files for data_type',data_type)
             
-            return [x.get_data() for x in list(self.container[data_type].values()) ]
+            return [x.get_data(tmin) for x in list(self.container[data_type].values()) ]
         else:
             raise TypeError
         
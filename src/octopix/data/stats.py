@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Statistics shown in the Table tab"""
+
+import numpy as np
+import pandas as pd
+
+stats_columns = ['count','mean','min','max','std']
+
+
+def describe(df):
+    """Return count, mean, min, max and std of each column of df as rows.
+    They are accumulated in float64, column by column, even if the data is
+    kept in float32.
+    """
+    try:
+        des = df.select_dtypes('number').apply(lambda c: c.astype(np.float64,copy=False).describe()).T.loc[:,stats_columns]
+    except:
+        des = pd.DataFrame()
+
+    return des
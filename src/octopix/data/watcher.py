@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Event driven change detection for the postProcessing directory"""
+
+from pathlib import Path
+
+from PyQt5.QtCore import QObject,QFileSystemWatcher,pyqtSignal
+
+
+class PostProcessingWatcher(QObject):
+    """Watches the postProcessing directory, the directories of the found
+    function objects and the currently displayed data files (inotify on Linux).
+
+    On a change, the name of the affected directory in postProcessing is
+    emitted, or '' if postProcessing itself changed (e.g. a new function
+    object). On network file systems the events may not arrive at all, so
+    polling is still needed as fallback.
+    """
+
+    changed = pyqtSignal(str)
+
+    def __init__(self,parent=None):
+
+        super(PostProcessingWatcher,self).__init__(parent)
+
+        self.root = None
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_path_changed)
+        self._watcher.fileChanged.connect(self._on_path_changed)
+
+    def watch(self,working_dir,ppObjects,dat_paths=()):
+        """Set the watched paths.
+
+        Parameters
+        ----------
+
+        working_dir : Path-like
+            the postProcessing parents directory
+        ppObjects : dict
+            the function objects, as found by the OFppScanner
+        dat_paths : list of Path
+            the displayed data files and by that their time directories
+        """
+        self.root = Path(working_dir,'postProcessing')
+
+        paths = set()
+
+        if self.root.is_dir():
+            paths.add(self.root)
+            for data_type,names in ppObjects.items():
+                # rigidBodyState lists the data files, see find_all_OF_ppObjects
+                if data_type == 'rigidBodyState':
+                    paths.add(self.root / 'rigidBodyState')
+                else:
+                    paths.update(self.root / name for name in names)
+            for p in dat_paths:
+                paths.add(Path(p))
+                paths.add(Path(p).parent)
+
+        wanted = {str(p) for p in paths}
+        watched = set(self._watcher.files()) | set(self._watcher.directories())
+
+        if watched - wanted:
+            self._watcher.removePaths(sorted(watched - wanted))
+        if wanted - watched:
+            self._watcher.addPaths(sorted(wanted - watched))
+
+    def stop(self):
+        """Stop watching any path."""
+
+        watched = self._watcher.files() + self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+
+    def _on_path_changed(self,path):
+
+        try:
+            parts = Path(path).relative_to(self.root).parts
+        except ValueError:
+            return
+
+        self.changed.emit(parts[0] if parts else '')
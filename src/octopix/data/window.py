@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Selection of fields and time windows without copying the data.
+
+OpenFOAM's time is monotonic, hence the time window is resolved by binary
+search on the time index into a positional slice. The results are views on
+the loaded data, which is never modified in place.
+"""
+
+import pandas as pd
+
+
+def select_columns(df,data_subset):
+    """Return the columns in data_subset, all columns if none of them
+    (or nothing) is selected.
+    """
+    columns = [c for c in data_subset if c in df.columns]
+
+    if not columns or columns == list(df.columns):
+        return df
+
+    return df[columns]
+
+
+def time_slice(index,tmin=None,tmax=None):
+    """Positions of the times within [tmin,tmax] of a sorted index as slice."""
+
+    i0 = 0 if tmin is None else index.searchsorted(tmin,side='left')
+    i1 = len(index) if tmax is None else index.searchsorted(tmax,side='right')
+
+    return slice(i0,max(i0,i1))
+
+
+def time_window(df,tmin=None,tmax=None):
+    """Return the rows of df with tmin <= time <= tmax, None for no limit."""
+
+    if tmin is None and tmax is None:
+        return df
+
+    if not df.index.is_monotonic_increasing:
+        mask = df.index.notna()
+        if tmin is not None:
+            mask &= df.index >= tmin
+        if tmax is not None:
+            mask &= df.index <= tmax
+        return df[mask]
+
+    return df.iloc[time_slice(df.index,tmin,tmax)]
+
+
+def truncate(df,t):
+    """Return the rows of df before time t."""
+
+    if df.index.is_monotonic_increasing:
+        return df.iloc[:df.index.searchsorted(t,side='left')]
+
+    return df[df.index < t]
+
+
+def merge_segments(segments):
+    """Merge the data of consecutive runs, i.e. of the time directories of a
+    restarted simulation, into one series. A run replaces the data of the
+    earlier runs from its first time on.
+
+    Parameter
+    ---------
+
+    segments : list of DataFrame
+        the data of the runs, in the order of the time directories
+    """
+    parts = []
+    cutoff = None
+
+    for seg in reversed(segments):
+        if cutoff is not None:
+            seg = truncate(seg,cutoff)
+        if not seg.empty:
+            parts.append(seg)
+            cutoff = seg.index[0] if cutoff is None else min(cutoff,seg.index[0])
+
+    if not parts:
+        return segments[-1]
+    if len(parts) == 1:
+        return parts[0]
+
+    return pd.concat(parts[::-1])
@@ -13,6 +13,7 @@ import numpy as np
 import pandas as pd
 
 from octopix.data.funcs import are_equal
+from octopix.show.decimation import MinMaxPyramid
 
 class CanvasLayout(QVBoxLayout):
 
@@ -27,6 +28,9 @@ class CanvasLayout(QVBoxLayout):
 
 
 class MplCanvas(FigureCanvasQTAgg):
+    
+    # fraction of the data span added above the data on the autoscaled x-axis
+    xheadroom = 0.1
 
     def __init__(self, parent=None, width=5, height=4, dpi=100,settings={}):
         self.fig = Figure(figsize=(width, height), dpi=dpi, tight_layout=True)
@@ -37,6 +41,9 @@ class MplCanvas(FigureCanvasQTAgg):
         self._plot_refs = None
         self._plot_refs_full = None
         self._mean_refs = None
+        # the full series of the plotted lines, the lines only get the
+        # decimated data of the visible range
+        self._series = {}
         self.current_data_type = None
         self.current_data_file = None
         self.fields = None
@@ -44,12 +51,123 @@ class MplCanvas(FigureCanvasQTAgg):
         self.show_mean = False
         self.style = settings.get('style','classic')
         self._base_figsize = (width, height)
+        
+        # the lines are animated, i.e. not part of the regular draw. After each 
+        # full draw the background is kept, so that on updates with unchanged 
+        # limits only the lines need to be drawn and blitted.
+        self._background = None
+        self._drawn_style = None
+        self.mpl_connect('draw_event',self._on_draw)
+        
+        self.axes.callbacks.connect('xlim_changed',self._on_xlim_changed)
 
     def resizeEvent(self, event):
         super(MplCanvas, self).resizeEvent(event)
         self._update_font_sizes()
+        self._on_xlim_changed(self.axes)
         self.draw_idle()
 
+    def _clear_axes(self):
+        
+        self.axes.cla()
+        self._series = {}
+        # cla() also drops the callbacks
+        self.axes.callbacks.connect('xlim_changed',self._on_xlim_changed)
+
+    def _decimated(self,x,pyramid):
+        """Reduce the series to the visible range and about two points per pixel.
+        With autoscaling on, the visible range is given by the data itself.
+        """
+        if self.axes.get_autoscalex_on():
+            i0,i1 = 0,len(x)
+        else:
+            xmin,xmax = sorted(self.axes.get_xlim())
+            # one point beyond the limits, so the lines leave the axes
+            i0 = max(0,np.searchsorted(x,xmin,side='left') - 1)
+            i1 = min(len(x),np.searchsorted(x,xmax,side='right') + 1)
+        
+        idx = pyramid.decimate(i0,i1,self.axes.bbox.width)
+        
+        return x[idx],pyramid.y[idx]
+
+    def _plot(self,x,y,**kwargs):
+        
+        x = np.asarray(x,dtype=float)
+        pyramid = MinMaxPyramid(y)
+        
+        line = self.axes.plot(*self._decimated(x,pyramid),**kwargs)[0]
+        self._series[line] = (x,pyramid)
+        
+        return line
+
+    def _set_series(self,line,x,y):
+        """New data for a line. If the data was only appended, the 
+        pyramid of the line is extended instead of rebuilt.
+        """
+        x = np.asarray(x,dtype=float)
+        old_x,pyramid = self._series[line]
+        n = len(old_x)
+        
+        if len(x) >= n and (n == 0 or (x[0] == old_x[0] and x[n - 1] == old_x[n - 1])):
+            pyramid.update(y)
+        else:
+            pyramid = MinMaxPyramid(y)
+        
+        self._series[line] = (x,pyramid)
+        line.set_data(*self._decimated(x,pyramid))
+
+    def _autoscale(self,keep=True):
+        """Autoscale the axes to the data. Above the data, the x-axis gets
+        headroom of xheadroom times its span. With keep, the x-limits are 
+        kept, as long as the data fits into them and they are not too wide, 
+        so that the lines of appended data can be blitted.
+        
+        Returns
+        -------
+        
+        True, if the limits are unchanged
+        """
+        limits = (self.axes.get_xlim(),self.axes.get_ylim())
+        
+        self.axes.relim()
+        self.axes.autoscale_view()
+        
+        if self.axes.get_autoscalex_on():
+            x0,x1 = self.axes.get_xlim()
+            d0,d1 = self.axes.dataLim.intervalx
+            old0,old1 = limits[0]
+            span = x1 - x0
+            if keep and old0 <= d0 and d1 <= old1 and old1 - old0 <= (1 + 2*self.xheadroom)*span:
+                xlim = limits[0]
+            else:
+                xlim = (x0,x1 + self.xheadroom*span)
+            # auto=None keeps the autoscaling on
+            self.axes.set_xlim(xlim,auto=None)
+        
+        return limits == (self.axes.get_xlim(),self.axes.get_ylim())
+
+    def _on_xlim_changed(self,axes):
+        """Zooming and panning with the toolbar changes the visible range."""
+        for line,(x,pyramid) in self._series.items():
+            line.set_data(*self._decimated(x,pyramid))
+
+    def _animated_artists(self):
+        return (self._plot_refs_full or []) + (self._plot_refs or []) + (self._mean_refs or [])
+
+    def _on_draw(self,event):
+        
+        self._background = self.copy_from_bbox(self.fig.bbox)
+        for artist in self._animated_artists():
+            self.fig.draw_artist(artist)
+
+    def _blit(self):
+        """Redraw only the lines on top of the background of the last full draw."""
+        
+        self.restore_region(self._background)
+        for artist in self._animated_artists():
+            self.fig.draw_artist(artist)
+        self.blit(self.fig.bbox)
+
     def _font_size(self):
         width, height = self.fig.get_size_inches()
         base_w, base_h = self._base_figsize
@@ -109,7 +227,8 @@ class MplCanvas(FigureCanvasQTAgg):
  
     def clear(self):
         
-        self.axes.cla()
+        self._clear_axes()
+        self._background = None
         textstr = 'No Data\navailable'
         props = dict(boxstyle='round', facecolor=np.array([163, 130, 38])/255., alpha=0.5)
         self.axes.text(0.45, 0.55, textstr, transform=self.axes.transAxes, fontsize=10,verticalalignment='top', bbox=props)
@@ -150,17 +269,18 @@ class MplCanvas(FigureCanvasQTAgg):
                 self.show_all = show_all
                 self.show_mean = show_mean
                 
-                self.axes.cla()
+                self._clear_axes()
                                 
                 if show_all:
                     plot_refs_full = [
-                        self.axes.plot(
+                        self._plot(
                             self.full_df.index,
                             self.full_df[col],
                             color="lightgray",
                             linewidth=1.0,
                             label="_full",
-                        )[0]
+                            animated=True,
+                        )
                         for col in list(self.full_df)
                     ]
                 else:
@@ -168,7 +288,7 @@ class MplCanvas(FigureCanvasQTAgg):
 
                 if not self.df.empty:
                     plot_refs = [
-                        self.axes.plot(self.df.index, self.df[col], label=col)[0]
+                        self._plot(self.df.index, self.df[col], label=col, animated=True)
                         for col in list(self.df)
                     ]
                 else:
@@ -187,6 +307,7 @@ class MplCanvas(FigureCanvasQTAgg):
                             linestyle="--",
                             linewidth=1.0,
                             label="_mean",
+                            animated=True,
                         )
                         mean_refs.append(mean_line)
                 else:
@@ -210,15 +331,16 @@ class MplCanvas(FigureCanvasQTAgg):
                 self._plot_refs = plot_refs
                 self._plot_refs_full = plot_refs_full
                 self._mean_refs = mean_refs
+                self._autoscale(keep=False)
                 
             else:
                
                 for i,col in enumerate(list(self.df)):
-                    self._plot_refs[i].set_data(self.df.index, self.df[col])
+                    self._set_series(self._plot_refs[i], self.df.index, self.df[col])
 
                 if self._plot_refs_full is not None:
                     for i,col in enumerate(list(self.full_df)):
-                        self._plot_refs_full[i].set_data(self.full_df.index, self.full_df[col])
+                        self._set_series(self._plot_refs_full[i], self.full_df.index, self.full_df[col])
 
                 if self._mean_refs is not None:
                     for i, col in enumerate(list(self.df)):
@@ -227,11 +349,18 @@ class MplCanvas(FigureCanvasQTAgg):
                             continue
                         self._mean_refs[i].set_ydata([mean_val, mean_val])
     
-                self.axes.relim()
-                self.axes.autoscale_view()
+                # fast path, if only the lines have changed
+                if (
+                    self._autoscale()
+                    and self._background is not None
+                    and self._drawn_style == self.style
+                ):
+                    self._blit()
+                    return
 
         self.setPlotStyle()
         self._update_font_sizes()
+        self._drawn_style = self.style
         self.draw()
 
             
@@ -239,4 +368,13 @@ class MplCanvas(FigureCanvasQTAgg):
         
         fig_name = "{0:}.png".format(self.current_data_file)
         
+        # animated artists are not part of a printed figure
+        artists = self._animated_artists()
+        for artist in artists:
+            artist.set_animated(False)
+        
         self.print_figure(fig_name,dpi=200)
+        
+        for artist in artists:
+            artist.set_animated(True)
+        self.draw_idle()
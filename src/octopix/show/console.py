@@ -13,15 +13,15 @@ from PyQt5.QtGui import QKeySequence
 
 import pandas as pd
 
+from octopix.data.stats import describe
+
 class OctopixTableView(QTableView):
     
     def stats(self):
-        try:
-            des = self.df.describe().T.loc[:,['count','mean','min','max','std']]
-        except:
-            des = pd.DataFrame()
+        if self._stats is None:
+            self._stats = describe(self.df)
         
-        return des
+        return self._stats
     
     def __init__(self,data=pd.DataFrame(),*args,**kwargs):
         
@@ -32,15 +32,18 @@ class OctopixTableView(QTableView):
         self.installEventFilter(self)
         
         
-    def update(self,data, *args, **kwargs):
+    def update(self,data, *args, stats=None, **kwargs):
         
-        self.setData(data)
+        self.setData(data,stats)
 
         return QTableView.update(self, *args, **kwargs)
 
-    def setData(self,data):
-        
+    def setData(self,data,stats=None):
+        """Show the statistics of data. If already computed (e.g. by the 
+        loader in the background), they can be passed with stats.
+        """
         self.df = data
+        self._stats = stats
         
         self.setModel(PandasModel(self.stats()))
         
@@ -122,12 +125,7 @@ class TimeSeriesData(object):
         self.df = df
 
     def stats(self):
-        try:
-            des = self.df.describe().T.loc[:,['count','mean','min','max','std']]
-        except:
-            des = pd.DataFrame()
-        
-        return des
+        return describe(self.df)
 
 
 class OutputTextField(QPlainTextEdit):
@@ -194,8 +192,8 @@ class Console(QTabWidget):
         self.table_tab.setLayout(self.table_tab.layout)
                 
     
-    def update(self,data):
-        self.view.update(data)
+    def update(self,data,stats=None):
+        self.view.update(data,stats=stats)
 
 
     def set_dark_mode(self):
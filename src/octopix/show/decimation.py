@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Reduction of long time series to what can be displayed on screen"""
+
+import numpy as np
+
+
+def _reduce_pairs(vmin,vmax,imin,imax):
+    """Combine two consecutive blocks each into one block of the double size."""
+    n = len(vmin)//2
+    a,b = slice(0,2*n,2),slice(1,2*n,2)
+
+    # NaN is only kept if both blocks are NaN
+    take_b = (vmin[b] < vmin[a]) | np.isnan(vmin[a])
+    new_min = np.where(take_b,vmin[b],vmin[a])
+    new_imin = np.where(take_b,imin[b],imin[a])
+
+    take_b = (vmax[b] > vmax[a]) | np.isnan(vmax[a])
+    new_max = np.where(take_b,vmax[b],vmax[a])
+    new_imax = np.where(take_b,imax[b],imax[a])
+
+    return new_min,new_max,new_imin,new_imax
+
+
+class MinMaxPyramid(object):
+    """Level of detail index of a series for fast min/max decimation.
+
+    Level k holds minimum and maximum (value and index) of the blocks of
+    2**k points, level 0 is the series itself. The first and last value
+    of a block are the series values at the block boundaries and not
+    stored separately. Only complete blocks are stored, the pyramid is
+    extended when points are appended to the series.
+
+    The levels are kept in preallocated arrays, whose capacity is doubled
+    when full, like the ColumnStore. Appending only computes the new blocks
+    and writes them behind the old ones. The values keep the dtype of the 
+    series, e.g. float32.
+
+    A range of the series is decimated on the level whose blocks are about
+    the size of a bucket, so that the cost depends on the number of buckets
+    and not on the length of the range.
+
+    Parameter
+    ---------
+
+    y : ndarray
+        the series
+    """
+
+    min_capacity = 64
+
+    def __init__(self,y):
+
+        self.y = self._series(y)
+        self._buffers = []
+        self._counts = []
+        self._extend(0)
+
+    def __len__(self):
+        return len(self.y)
+
+    @staticmethod
+    def _series(y):
+        """The series as array without a copy, if it is a float array already."""
+        y = np.asarray(y)
+        if y.dtype.kind != 'f':
+            y = y.astype(float)
+        return y
+
+    @property
+    def levels(self):
+        """The stored blocks of the levels 1, 2, ... as views on the arrays."""
+        return [tuple(a[:n] for a in buffers) for buffers,n in zip(self._buffers,self._counts)]
+
+    def extends(self,y):
+        """Check if y is the series of the pyramid with points appended."""
+        n = len(self.y)
+        return (
+            len(y) >= n
+            and (n == 0 or np.array_equal(y[[0,n - 1]],self.y[[0,n - 1]],equal_nan=True))
+        )
+
+    def update(self,y):
+        """Set the series to y, which is cheap, if y is the old series with
+        points appended, otherwise the pyramid is rebuilt.
+        """
+        y = self._series(y)
+
+        if y.dtype == self.y.dtype and self.extends(y):
+            n = len(self.y)
+            self.y = y
+            self._extend(n)
+        else:
+            self.y = y
+            self._buffers = []
+            self._counts = []
+            self._extend(0)
+
+    def _reserve(self,i,n):
+        """Make room for n blocks on the level i + 1."""
+
+        buffers = self._buffers[i]
+        if len(buffers[0]) >= n:
+            return
+
+        capacity = max(n,2*len(buffers[0]),self.min_capacity)
+        count = self._counts[i]
+        grown = []
+        for a in buffers:
+            b = np.empty(capacity,dtype=a.dtype)
+            b[:count] = a[:count]
+            grown.append(b)
+        self._buffers[i] = tuple(grown)
+
+    def _extend(self,n_old):
+        """(Re)compute the blocks containing points from n_old on."""
+
+        y = self.y
+        lower = None
+
+        k = 1
+        while len(y)//2**k > 0:
+            size = 2**k
+            n_blocks = len(y)//size
+
+            if k > len(self._buffers):
+                self._buffers.append(tuple(np.empty(0,dtype=d) for d in (y.dtype,y.dtype,np.int64,np.int64)))
+                self._counts.append(0)
+
+            keep = min(n_old//size,self._counts[k - 1])
+
+            if keep < n_blocks:
+                start,stop = 2*keep,2*n_blocks
+                if lower is None:
+                    idx = np.arange(start,stop)
+                    pairs = (y[start:stop],y[start:stop],idx,idx)
+                else:
+                    pairs = tuple(a[start:stop] for a in lower)
+                new = _reduce_pairs(*pairs)
+
+                self._reserve(k - 1,n_blocks)
+                for a,b in zip(self._buffers[k - 1],new):
+                    a[keep:n_blocks] = b
+                self._counts[k - 1] = n_blocks
+
+            lower = tuple(a[:n_blocks] for a in self._buffers[k - 1])
+            k += 1
+
+    def _minmax_indices(self,i0,i1):
+
+        t = self.y[i0:i1]
+        if len(t) == 0 or np.isnan(t).all():
+            return np.empty(0,dtype=np.int64)
+
+        return i0 + np.sort([np.nanargmin(t),np.nanargmax(t)])
+
+    def decimate(self,i0,i1,n_buckets):
+        """Indices of the min/max points of about n_buckets buckets in the
+        range [i0,i1) of the series, incl. the first and the last point.
+        """
+        n = i1 - i0
+        n_buckets = max(1,int(n_buckets))
+
+        if n <= 2*n_buckets + 2:
+            return np.arange(i0,i1)
+
+        k = min(len(self._counts),int(np.ceil(np.log2(n/n_buckets))))
+        size = 2**k
+
+        vmin,vmax,imin,imax = (a[:self._counts[k - 1]] for a in self._buffers[k - 1])
+
+        # the blocks within the range, the remaining points at the beginning
+        # and the end (less than a block each) are reduced directly
+        b0 = -(-i0//size)
+        b1 = max(b0,min(i1//size,len(vmin)))
+
+        idx = [np.array([i0])]
+        idx.append(self._minmax_indices(i0,min(i1,b0*size)))
+        idx.append(np.sort(np.stack([imin[b0:b1],imax[b0:b1]],axis=1),axis=1).ravel())
+        idx.append(self._minmax_indices(max(i0,b1*size),i1))
+        idx.append(np.array([i1 - 1]))
+
+        return np.concatenate(idx)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the parse engines against the octopost reader.
+
+By default a synthetic case is written to a temporary directory, e.g.
+
+    python -m octopix.test.bench_parse --format forces --size 300
+
+or an existing function object is read:
+
+    python -m octopix.test.bench_parse --case <case dir> --type forces --name forces
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from octopix.data.scanner import find_dat_paths
+from octopix.data.parsing import engines,parse_lines,last_line_width
+
+from octopost.reader import makeRuntimeSelectableReader
+
+
+def _forces_lines(t,rng):
+    v = rng.standard_normal((len(t),18))
+    cols = ' '.join(['{%d:.6e}' % i for i in range(18)])
+    # ((f_total) (f_pressure) (f_viscous)) ((m_total) (m_pressure) (m_viscous))
+    fmt = '{t:.6g}\t((%s %s %s) (%s %s %s) (%s %s %s))\t((%s %s %s) (%s %s %s) (%s %s %s))\n' % tuple(cols.split())
+    return [fmt.format(*row,t=ti) for ti,row in zip(t,v)]
+
+
+def _residuals_lines(t,rng):
+    v = rng.random((len(t),12))
+    lines = []
+    for ti,row in zip(t,v):
+        # solved fields only have entries every other step
+        vals = ['{0:.6e}'.format(x) if (i < 4 or int(ti*10) % 2 == 0) else 'N/A' for i,x in enumerate(row)]
+        lines.append('{0:.6g}\t'.format(ti) + '\t'.join(vals) + '\n')
+    return lines
+
+
+def _time_lines(t,rng):
+    v = rng.random((len(t),4))
+    return ['{0:.6g}\t{1:.6e}\t{2:.6e}\t{3:.6e}\t{4:.6e}\n'.format(ti,*row) for ti,row in zip(t,v)]
+
+
+formats = {
+    'forces': ('forces','# Forces\n# CofR : (0 0 0)\n# Time forces moments\n',_forces_lines),
+    'residuals': ('residuals','# Solver information\n# Time p_initial p_final ...\n',_residuals_lines),
+    'time': ('time','# Time\n# Time cpu clock cpu/step clock/step\n',_time_lines),
+}
+
+
+def write_case(case_dir,fmt,size_mb):
+    """Write a synthetic .dat file of about size_mb MB, return the data type
+    and the function object name.
+    """
+    data_type,header,make_lines = formats[fmt]
+    data_name = fmt
+
+    path = Path(case_dir,'postProcessing',data_name,'0',data_type + '.dat')
+    path.parent.mkdir(parents=True)
+
+    rng = np.random.default_rng(0)
+    chunk = 20000
+    step = 0
+
+    with open(path,'w') as f:
+        f.write(header)
+        while f.tell() < size_mb*1024**2:
+            t = (step + np.arange(chunk))*1e-3
+            f.write(''.join(make_lines(t,rng)))
+            step += chunk
+
+    return data_type,data_name
+
+
+def timed(func,repeat):
+
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best,dt)
+
+    return best,result
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='compare the parse engines with the octopost reader')
+    parser.add_argument('--format',choices=sorted(formats),default='forces',help='format of the synthetic case')
+    parser.add_argument('--size',type=float,default=300,help='size of the synthetic file in MB')
+    parser.add_argument('--case',help='use an existing case instead of a synthetic one')
+    parser.add_argument('--type',help='data type of the function object in --case')
+    parser.add_argument('--name',help='name of the function object in --case')
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--skip-octopost',action='store_true')
+    args = parser.parse_args(argv)
+
+    tmp = None
+    if args.case:
+        case_dir,data_type,data_name = Path(args.case),args.type,args.name
+    else:
+        tmp = tempfile.mkdtemp(prefix='octopix_bench_')
+        case_dir = Path(tmp)
+        print('writing {0:} file of {1:g} MB ...'.format(args.format,args.size))
+        data_type,data_name = write_case(case_dir,args.format,args.size)
+
+    try:
+        path = find_dat_paths(data_type,data_name,case_dir)[-1]
+        buf = path.read_bytes()
+        size_mb = len(buf)/1024**2
+        print('{0:} ({1:.1f} MB)\n'.format(path,size_mb))
+
+        results = []
+
+        if not args.skip_octopost:
+            dt,reader = timed(lambda: makeRuntimeSelectableReader(reader_name=data_type,base_dir=data_name,case_dir=case_dir),args.repeat)
+            columns = [str(c) for c in reader.data.columns]
+            results.append(('octopost',dt,len(reader.data)))
+        else:
+            columns = ['c{0:}'.format(i) for i in range(last_line_width(buf) - 1)]
+
+        for name in engines:
+            dt,df = timed(lambda: parse_lines(buf,columns,engine=name),args.repeat)
+            results.append((name,dt,None if df is None else len(df)))
+            dt,df = timed(lambda: parse_lines(buf,columns,usecols=columns[:1],engine=name),args.repeat)
+            results.append((name + ' (1 field)',dt,None if df is None else len(df)))
+
+        print('{0:<20} {1:>10} {2:>10} {3:>10}'.format('engine','time [s]','MB/s','rows'))
+        for name,dt,rows in results:
+            print('{0:<20} {1:>10.3f} {2:>10.1f} {3:>10}'.format(name,dt,size_mb/dt,'failed' if rows is None else rows))
+
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp,ignore_errors=True)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
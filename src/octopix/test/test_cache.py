@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of the reader cache, run with pytest"""
+
+import configparser
+
+import numpy as np
+import pytest
+
+pytest.importorskip('octopost')
+
+from octopix.data.cache import ReaderCache
+
+
+def _section(text):
+    """A config section as read from octopix.ini, which lowercases the options."""
+    config = configparser.ConfigParser()
+    config.read_string(text)
+    return dict(config[config.sections()[0]])
+
+
+def test_engine_by_data_type(tmp_path):
+    engines = _section('[parsing]\nengine = pandas\nrigidBodyState = numpy\nfieldMinMax = pyarrow\n')
+    readers = ReaderCache(engines=engines)
+
+    assert readers.get(tmp_path,'rigidBodyState','rbs').engine == 'numpy'
+    assert readers.get(tmp_path,'fieldMinMax','minmax').engine == 'pyarrow'
+    assert readers.get(tmp_path,'forces','forces').engine == 'pandas'
+
+
+def test_precision_by_data_type(tmp_path):
+    precisions = _section('[storage]\nprecision = float64\nrigidBodyState = float32\nactuatorDisk = float32\n')
+    readers = ReaderCache(precisions=precisions)
+
+    assert readers.get(tmp_path,'rigidBodyState','rbs').dtype == np.float32
+    assert readers.get(tmp_path,'actuatorDisk','disk').dtype == np.float32
+    assert readers.get(tmp_path,'forces','forces').dtype == np.float64
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of the plot canvas, run with pytest"""
+
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM','offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+import numpy as np
+import pandas as pd
+
+from octopix.show.canvas import MplCanvas
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def _data(n):
+    t = 0.1*np.arange(n)
+    return pd.DataFrame({'Fx':np.sin(t),'Fy':np.cos(t)},index=pd.Index(t,name='Time'))
+
+
+def _counting(canvas):
+    counts = {'draw':0,'blit':0}
+
+    def counted(name,method):
+        def wrapper(*args,**kwargs):
+            counts[name] += 1
+            return method(*args,**kwargs)
+        return wrapper
+
+    canvas.draw = counted('draw',canvas.draw)
+    canvas._blit = counted('blit',canvas._blit)
+    return counts
+
+
+def test_append_is_blitted(app):
+    """Appended data, which fits into the headroom of the x-axis, only
+    redraws the lines.
+    """
+    canvas = MplCanvas()
+    canvas.update_plot(_data(1000),'forces','forces')
+    counts = _counting(canvas)
+
+    for n in range(1010,1100,10):
+        canvas.update_plot(_data(n),'forces','forces')
+
+    assert counts == {'draw':0,'blit':9}
+    assert canvas.axes.get_autoscalex_on()
+    assert canvas.axes.get_xlim()[1] >= 109.9
+
+
+def test_append_beyond_headroom_is_drawn(app):
+    """Once the data grows out of the headroom, the limits are updated."""
+    canvas = MplCanvas()
+    canvas.update_plot(_data(1000),'forces','forces')
+    counts = _counting(canvas)
+
+    canvas.update_plot(_data(2000),'forces','forces')
+
+    assert counts == {'draw':1,'blit':0}
+    assert canvas.axes.get_xlim()[1] >= 199.9
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of the header cache, run with pytest"""
+
+from octopix.data.header import HeaderCache
+
+
+names = {'columns':['Time','f0'],'index_name':'Time','fields':['Fx']}
+
+
+def _write(path,text):
+    path.parent.mkdir(parents=True,exist_ok=True)
+    with open(path,'w') as f:
+        f.write(text)
+
+
+def test_same_columns_and_format(tmp_path):
+    """Files differing only in comments and number formatting share the names."""
+    cache = HeaderCache()
+
+    a,b = tmp_path / 'a.dat',tmp_path / 'b.dat'
+    _write(a,'# Force\n# CofR : (0 0 0)\n# Time  forces\n0\t((1 2 3) (4 5 6))\n')
+    _write(b,'# Force\n# CofR : (1.5 0 0)\n#\n# Time forces\n1e-3  ( (1 -2 3) (4 5 6.5) )\n')
+
+    cache.put('forces',a,names)
+
+    assert cache.get('forces',b) == names
+    assert cache.get('residuals',b) is None
+
+
+def test_other_columns_or_format(tmp_path):
+    cache = HeaderCache()
+
+    a,b,c = tmp_path / 'a.dat',tmp_path / 'b.dat',tmp_path / 'c.dat'
+    _write(a,'# Time forces\n0\t((1 2 3) (4 5 6))\n')
+    _write(b,'# Time moments\n0\t((1 2 3) (4 5 6))\n')
+    _write(c,'# Time forces\n0\t(1 2 3)\t(4 5 6)\n')
+
+    cache.put('forces',a,names)
+
+    assert cache.get('forces',b) is None
+    assert cache.get('forces',c) is None
+
+
+def test_header_only_file_is_keyed_again(tmp_path):
+    """The format is only known, once the first data line is written."""
+    cache = HeaderCache()
+
+    a,b = tmp_path / 'a.dat',tmp_path / 'b.dat'
+    _write(a,'# Time forces\n0\t((1 2 3) (4 5 6))\n')
+    _write(b,'# Time forces\n')
+
+    cache.put('forces',a,names)
+    assert cache.get('forces',b) is None
+
+    with open(b,'a') as f:
+        f.write('0\t((1 2 3) (4 5 6))\n')
+    assert cache.get('forces',b) == names
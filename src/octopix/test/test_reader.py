@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of the TailReader, run with pytest"""
+
+import pytest
+
+pytest.importorskip('octopost')
+
+from octopix.data.reader import TailReader
+
+
+header = '# Forces\n# Time forces moments\n'
+
+
+def _lines(steps,dt=0.1):
+    return ''.join('{0:.4f}\t(({1:} 2 3) (4 5 6))\t((7 8 9) (1 2 3))\n'.format(i*dt,i) for i in steps)
+
+
+def _write(path,text,mode='w'):
+    path.parent.mkdir(parents=True,exist_ok=True)
+    with open(path,mode) as f:
+        f.write(text)
+
+
+def test_restart_seen_with_header_only(tmp_path):
+    """The rows of a restart, whose file was first read with its header only,
+    replace the data of the crashed run from the restart time on.
+    """
+    base = tmp_path / 'postProcessing' / 'forces'
+    _write(base / '0' / 'forces.dat',header + _lines(range(5001)))
+
+    reader = TailReader('forces','forces',tmp_path)
+    reader.update()
+    assert reader.data.index[-1] == pytest.approx(500.0)
+
+    _write(base / '460' / 'forces.dat',header)
+    reader.update()
+
+    _write(base / '460' / 'forces.dat',_lines(range(4600,4701)),mode='a')
+    assert reader.update()
+
+    assert reader.data.index.is_monotonic_increasing
+    assert reader.data.index[-1] == pytest.approx(470.0)
+    assert len(reader.data) == 4701
+
+
+@pytest.mark.parametrize('tmin,stored',[(0.0,True),(250.0,False)])
+def test_window_from_first_line_is_stored(tmp_path,tmin,stored):
+    """A window starting at or before the first time holds all data and is
+    written to the on-disk cache, a real window is not.
+    """
+    base = tmp_path / 'postProcessing'
+    for name in ('forces1','forces2'):
+        _write(base / name / '0' / 'forces.dat',header + _lines(range(5001)))
+
+    cache = tmp_path / 'cache'
+
+    # the header is known from the first function object
+    TailReader('forces','forces1',tmp_path,cache_dir=cache).update()
+
+    reader = TailReader('forces','forces2',tmp_path,cache_dir=cache)
+    reader.update(tmin=tmin)
+
+    assert reader.data.index[-1] == pytest.approx(500.0)
+    assert (reader.tmin is None) == stored
+    assert (reader._stored_rows == len(reader.data)) == stored
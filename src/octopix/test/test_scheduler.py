@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests of the update scheduler, run with pytest"""
+
+import time
+from collections import namedtuple
+
+import pytest
+
+QtCore = pytest.importorskip('PyQt5.QtCore')
+
+from octopix.data.growth import GrowthTracker
+from octopix.data.scheduler import UpdateScheduler
+
+
+State = namedtuple('State',['path','ino','size'])
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+class FakeLoader(QtCore.QObject):
+
+    jobFinished = QtCore.pyqtSignal(float)
+
+    def __init__(self):
+        super(FakeLoader,self).__init__()
+        self.requests = []
+
+    def busy(self):
+        return False
+
+    def request(self,request,force=False,rescan=True):
+        self.requests.append((request,rescan))
+
+
+def _backed_off(max_interval):
+    """A tracker of an idle file, backed off to max_interval."""
+    growth = GrowthTracker(max_interval=max_interval)
+    state = State('forces.dat',1,100)
+    for i in range(10):
+        growth.observe([state],now=1000.0*i)
+    return growth
+
+
+def test_event_is_not_backed_off(app):
+    """A file system event updates right away, only the polling is backed off."""
+    loader = FakeLoader()
+    scheduler = UpdateScheduler(loader,lambda: 'request',growth=_backed_off(60.0))
+    scheduler.set_interval(1.0)
+
+    assert scheduler.effective_interval() == 60.0
+    assert scheduler.event_interval() == 1.0
+
+    # the last update was a few seconds ago
+    scheduler._last_start = time.perf_counter() - 5.0
+    scheduler.start()
+    assert scheduler.timer.remainingTime() > 50000
+
+    scheduler.tick(rescan=False)
+
+    assert loader.requests == [('request',False)]
+
+
+def test_event_is_spaced_by_interval(app):
+    """Events right after an update wait for the interval, not the back-off."""
+    loader = FakeLoader()
+    scheduler = UpdateScheduler(loader,lambda: 'request',growth=_backed_off(60.0))
+    scheduler.set_interval(1.0)
+
+    scheduler._last_start = time.perf_counter()
+    scheduler.start()
+    scheduler.tick(rescan=False)
+
+    assert loader.requests == []
+    # far from the back-off, the timers may be a few percent late
+    assert 0 < scheduler.timer.remainingTime() <= 2000